@@ -0,0 +1,21 @@
+import pytest
+
+pytest.importorskip("clang.cindex")
+
+from cut import code_generator  # noqa: E402
+from cut import context  # noqa: E402
+from cut import test_case  # noqa: E402
+
+
+def test_generate(benchmark, project):
+    ctx = context.RunContext(str(project / "compile_commands.json"), str(project))
+
+    def generate():
+        test_case.case_hash.clear()
+        cgen = code_generator.CodeGenerator(ctx.actions)
+        cgen.generate()
+        return cgen
+
+    cgen = benchmark(generate)
+    assert (project / "items.c_test_sum_items.c").exists()
+    assert len(cgen.generated) == 4
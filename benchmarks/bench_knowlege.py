@@ -0,0 +1,67 @@
+import pytest
+
+from conftest import synthetic_header
+
+cindex = pytest.importorskip("clang.cindex")
+
+from cut import knowlege  # noqa: E402
+
+
+@pytest.mark.parametrize("decls", [100, 1000, 5000])
+def test_get_info(benchmark, tmp_path, decls):
+    header = tmp_path / "synthetic.h"
+    synthetic_header(str(header), decls)
+    tu = cindex.Index.create().parse(str(header), ["-x", "c"])
+    funcs, variables, typedefs, structs = benchmark(knowlege.get_info, tu.cursor)
+    assert len(funcs) == decls + 2
+
+
+@pytest.mark.parametrize("header_cache", ["cold", "warm"])
+def test_harvest_tu(benchmark, tmp_path, header_cache):
+    header = tmp_path / "synthetic.h"
+    synthetic_header(str(header), 1000)
+    source = tmp_path / "user.c"
+    source.write_text('#include "synthetic.h"\nint user(struct s0 *p) { return p->a; }\n')
+    index = cindex.Index.create()
+
+    def harvest():
+        if header_cache == "cold":
+            knowlege._header_cache.clear()
+        return knowlege.harvest_tu(index, str(source), str(tmp_path), ["-x", "c"])
+
+    knowlege._header_cache.clear()
+    result = benchmark(harvest)
+    assert result["funcs"]["user"] == {"p": "struct s0 *"}
+    assert len(result["funcs"]) == 1000 + 3
+
+
+def test_harvest_tu_macro_before_include(tmp_path):
+    """A header is not reused for a translation unit that #defines a macro it depends on before including it."""
+    (tmp_path / "cfg.h").write_text(
+        "#ifdef WIDE\ntypedef long val_t;\n#else\ntypedef int val_t;\n#endif\nval_t get(val_t v);\n"
+    )
+    (tmp_path / "a.c").write_text('#include "cfg.h"\nint a(void) { return 0; }\n')
+    (tmp_path / "b.c").write_text('#define WIDE\n#include "cfg.h"\nint b(void) { return 0; }\n')
+    index = cindex.Index.create()
+    knowlege._header_cache.clear()
+    a = knowlege.harvest_tu(index, str(tmp_path / "a.c"), str(tmp_path), ["-x", "c"])
+    b = knowlege.harvest_tu(index, str(tmp_path / "b.c"), str(tmp_path), ["-x", "c"])
+    assert a["typedefs"]["val_t"] == "int"
+    assert b["typedefs"]["val_t"] == "long"
+    assert b["canonical"]["val_t"][0] == "long"
+
+
+def test_harvest_tu_macro_from_earlier_header(tmp_path):
+    """A header is not reused for a translation unit in which an earlier header #defines a macro it depends on."""
+    (tmp_path / "cfg.h").write_text(
+        "#ifdef WIDE\ntypedef long val_t;\n#else\ntypedef int val_t;\n#endif\nval_t get(val_t v);\n"
+    )
+    (tmp_path / "wide.h").write_text("#define WIDE\n")
+    (tmp_path / "a.c").write_text('#include "cfg.h"\nint a(void) { return 0; }\n')
+    (tmp_path / "b.c").write_text('#include "wide.h"\n#include "cfg.h"\nint b(void) { return 0; }\n')
+    index = cindex.Index.create()
+    knowlege._header_cache.clear()
+    a = knowlege.harvest_tu(index, str(tmp_path / "a.c"), str(tmp_path), ["-x", "c"])
+    b = knowlege.harvest_tu(index, str(tmp_path / "b.c"), str(tmp_path), ["-x", "c"])
+    assert a["typedefs"]["val_t"] == "int"
+    assert b["typedefs"]["val_t"] == "long"
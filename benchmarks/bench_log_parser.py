@@ -0,0 +1,24 @@
+import pytest
+
+from conftest import synthetic_compile_db
+from cut import log_parser
+
+
+def test_parse_options(benchmark):
+    entry = synthetic_compile_db(1)[0]
+    action = benchmark(log_parser.parse_options, entry)
+    assert action.source == "drivers/d0/f0.c"
+    assert action.compiler_standard == "-std=gnu11"
+
+
+@pytest.mark.parametrize("entries", [1000, 10000, 100000])
+def test_parse_unique_log(benchmark, tmp_path, entries):
+    db = synthetic_compile_db(entries)
+
+    def parse():
+        # parse_unique_log normalizes the entries in place
+        return log_parser.parse_unique_log([dict(e) for e in db], str(tmp_path), compile_uniqueing="strict")
+
+    rounds = 1 if entries >= 100000 else 3
+    actions, skipped = benchmark.pedantic(parse, rounds=rounds, iterations=1)
+    assert len(actions) == entries
@@ -0,0 +1,64 @@
+import copy
+
+import pytest
+
+from conftest import synthetic_case
+from cut import test_case
+
+
+@pytest.mark.parametrize("elements", [10, 100, 1000])
+def test_rewrite_case(benchmark, knowlege_base, elements):
+    case = synthetic_case(elements)
+    # rewriteCase consumes its input
+    ret = benchmark.pedantic(test_case.rewriteCase, setup=lambda: ((copy.deepcopy(case), knowlege_base), {}), rounds=20)
+    assert len(ret["values"]) == elements + 1
+
+
+@pytest.mark.parametrize("elements", [10, 100, 1000])
+def test_traverse_translation(benchmark, knowlege_base, elements):
+    case = synthetic_case(elements)
+    tc = test_case.TestCase("sum_items", case, knowlege_base)
+    params = list(tc._case_desc["parameters"].values())
+
+    def traverse():
+        for param in params:
+            tc.traverse_translation(param)
+
+    benchmark(traverse)
+
+
+@pytest.mark.parametrize("elements", [10, 100])
+def test_generate_func(benchmark, knowlege_base, fresh_case, elements):
+    case = synthetic_case(elements)
+
+    def generate(case_desc):
+        return test_case.TestCase("sum_items", case_desc, knowlege_base).generate_func()
+
+    code = benchmark.pedantic(generate, setup=lambda: fresh_case(case), rounds=10)
+    assert "sum_items(items, n);" in code
+
+
+class PointerTypedefBase:
+    """Knowledge base of count_nodes(node_t *head) with typedef struct node *node_t."""
+
+    def get_func_args(self, name, source=None):
+        return {"head": "node_t *"} if name == "count_nodes" else None
+
+    def get_typedef_type(self, name, source=None):
+        return "struct node *" if name == "node_t" else None
+
+    def get_canonical_type(self, name, source=None):
+        return ["struct node *", 1] if name == "node_t" else None
+
+
+def test_generate_func_pointer_typedef(fresh_case):
+    case = {
+        "parameters": {"reg_$0": "head"},
+        "types": {"reg_$0": "node_t *"},
+        "model": "",
+    }
+    (case_desc,), _ = fresh_case(case)
+    code = test_case.TestCase("count_nodes", case_desc, PointerTypedefBase()).generate_func()
+    assert "head = mymalloc((sizeof(struct node *)) * 1);" in code
+    assert "head[cam_loop_1] = mymalloc((sizeof(struct node)) * 1);" in code
+    assert "count_nodes(head);" in code
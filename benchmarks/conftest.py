@@ -0,0 +1,111 @@
+"""
+Shared fixtures of the cut benchmarks.
+
+Everything is derived from the files checked in under fixtures/, so the
+benchmarks run offline: the implicit compiler info is loaded from
+fixtures/compiler_info.json instead of probing gcc, and large inputs are
+built by replicating the fixture project deterministically.
+"""
+
+import copy
+import json
+import os
+import shutil
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+sys.path.insert(0, ROOT)
+
+from cut import log_parser  # noqa: E402
+from cut import test_case  # noqa: E402
+
+
+@pytest.fixture(scope="session", autouse=True)
+def compiler_info(tmp_path_factory):
+    """Implicit gcc include paths and targets, so no compiler is probed."""
+    with open(os.path.join(FIXTURES, "compiler_info.json")) as f:
+        info = f.read().replace("@FIXTURES@", FIXTURES)
+    path = tmp_path_factory.mktemp("compiler_info") / "compiler_info.json"
+    path.write_text(info)
+    log_parser.ImplicitCompilerInfo.load_compiler_info(str(path))
+
+
+def synthetic_compile_db(entries: int, directory: str = "/src") -> list:
+    """A compilation database of entries translation units with kernel-like flags."""
+    with open(os.path.join(FIXTURES, "project", "compile_commands.json")) as f:
+        template = json.load(f)[0]
+    db = []
+    for i in range(entries):
+        entry = dict(template)
+        entry["directory"] = directory
+        entry["file"] = "drivers/d{}/f{}.c".format(i % 97, i)
+        entry["command"] = (
+            template["command"].replace("items.c", entry["file"]).replace("items.o", entry["file"][:-2] + ".o")
+            + " -Iinclude -Iarch/x86/include -include linux/kconfig.h -D__KERNEL__ -DKBUILD_MODNAME=f{}".format(i)
+            + " -fno-strict-aliasing -fno-common -Wno-format-security -std=gnu11 -m64"
+        )
+        db.append(entry)
+    return db
+
+
+def synthetic_header(path: str, decls: int) -> None:
+    """Write a header with decls typedef chains, structs, globals and prototypes."""
+    with open(path, "w") as f:
+        f.write('#include "{}"\n'.format(os.path.join(FIXTURES, "project", "items.h")))
+        for i in range(decls):
+            f.write("typedef int t{0}_base;\ntypedef t{0}_base t{0}_alias;\n".format(i))
+            f.write("struct s{0} {{ t{0}_alias a; struct s{0} *next; struct item it; }};\n".format(i))
+            f.write("extern struct s{0} g{0};\n".format(i))
+            f.write("int fn{0}(struct s{0} *p, t{0}_alias n, const char *name);\n".format(i))
+
+
+def synthetic_case(elements: int) -> dict:
+    """A sum_items case description with elements array items accessed."""
+    with open(os.path.join(FIXTURES, "project", "items.c_sum_items.json")) as f:
+        case = json.load(f)[0]
+    model = ["reg_$0 -> #x{:08x}".format(elements)]
+    for i in range(elements):
+        sym = "reg_${}".format(i + 2)
+        case["parameters"][sym] = "Element{{SymRegion{{reg_$1<struct item *,items>}},{} S64b,struct item}}.len".format(
+            i
+        )
+        case["types"][sym] = "len_alias_t"
+        model.append("{} -> #x{:08x}".format(sym, i))
+    case["model"] = "\n".join(model)
+    return case
+
+
+@pytest.fixture
+def project(tmp_path):
+    """A copy of the fixture project with an absolute compilation database."""
+    dest = tmp_path / "project"
+    shutil.copytree(os.path.join(FIXTURES, "project"), str(dest))
+    db_file = dest / "compile_commands.json"
+    db = json.loads(db_file.read_text())
+    for entry in db:
+        entry["directory"] = str(dest)
+    db_file.write_text(json.dumps(db))
+    return dest
+
+
+@pytest.fixture
+def knowlege_base(project):
+    pytest.importorskip("clang.cindex")
+    from cut import context
+    from cut import knowlege
+
+    return knowlege.KnowlegeBase(context.RunContext(str(project / "compile_commands.json"), str(project)).actions)
+
+
+@pytest.fixture
+def fresh_case():
+    """Returns a setup function giving a new case description and an empty dedup table per round."""
+
+    def setup(case):
+        test_case.case_hash.clear()
+        return (copy.deepcopy(case),), {}
+
+    return setup
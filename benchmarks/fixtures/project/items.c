@@ -0,0 +1,17 @@
+#include "items.h"
+
+int item_count;
+
+int max(int a, int b) {
+  return a > b ? a : b;
+}
+
+int sum_items(struct item *items, int n) {
+  int sum = 0;
+  for (int i = 0; i < n; i++) {
+    if (items[i].len > 4)
+      sum += items[i].len;
+  }
+  item_count = n;
+  return sum;
+}
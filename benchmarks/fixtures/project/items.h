@@ -0,0 +1,20 @@
+#ifndef ITEMS_H
+#define ITEMS_H
+
+typedef int item_len_t;
+typedef item_len_t len_alias_t;
+
+struct item {
+  len_alias_t len;
+  char *name;
+  struct item *next;
+};
+
+typedef struct item item_t;
+
+extern int item_count;
+
+int sum_items(struct item *items, int n);
+int max(int a, int b);
+
+#endif
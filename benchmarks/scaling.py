@@ -0,0 +1,157 @@
+"""
+End-to-end scaling benchmark of the cut pipeline.
+
+Generates a synthetic C project (many translation units, a deep include
+chain, branchy functions), runs `cut -d compile_commands.json -j W` for
+W = 1, 2, 4, ... up to --max-jobs and reports throughput, peak RSS and
+parallel efficiency (speedup over one worker divided by W). Needs the
+CaseFind clang on PATH.
+
+    python benchmarks/scaling.py --tus 2000 --max-jobs 64 [--out DIR] [--json results.json]
+"""
+
+import argparse
+import glob
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def generate_project(path, tus, header_depth, funcs):
+    """Write the synthetic project and its compilation database to path."""
+    inc = os.path.join(path, "include")
+    os.makedirs(inc, exist_ok=True)
+    for d in range(header_depth):
+        with open(os.path.join(inc, "h{}.h".format(d)), "w") as f:
+            f.write("#ifndef H{0}_H\n#define H{0}_H\n".format(d))
+            if d + 1 < header_depth:
+                f.write('#include "h{}.h"\n'.format(d + 1))
+            f.write("typedef int h{0}_t;\n".format(d))
+            f.write("struct node{0} {{ h{0}_t key; int len; struct node{0} *next; }};\n".format(d))
+            f.write("int helper{0}(struct node{0} *n, int k);\n".format(d))
+            f.write("#define H{0}_LIMIT {1}\n#endif\n".format(d, 16 + d))
+
+    db = []
+    for t in range(tus):
+        src_dir = os.path.join(path, "src", "d{}".format(t % 64))
+        os.makedirs(src_dir, exist_ok=True)
+        src = os.path.join(src_dir, "tu{}.c".format(t))
+        depth = t % header_depth
+        with open(src, "w") as f:
+            f.write('#include "h0.h"\n\n')
+            for i in range(funcs):
+                f.write(
+                    "int tu{t}_f{i}(struct node{d} *n, int a, int b) {{\n"
+                    "  int r = 0;\n"
+                    "  if (a > b)\n    r = a - b;\n  else if (a == b)\n    r = H{d}_LIMIT;\n"
+                    "  if (n->len > a)\n    r += n->key;\n"
+                    "  for (int j = 0; j < b && j < H{d}_LIMIT; j++) {{\n"
+                    "    if (n->next && n->next->len == j)\n      r ^= j;\n  }}\n"
+                    "  switch (b & 3) {{\n  case 0: return r;\n  case 1: return r + 1;\n  default: return -r;\n  }}\n"
+                    "}}\n\n".format(t=t, i=i, d=depth)
+                )
+        db.append(
+            {
+                "directory": path,
+                "command": "gcc -c -O2 -I{} -DTU={} {} -o {}".format(inc, t, src, src[:-2] + ".o"),
+                "file": src,
+            }
+        )
+    with open(os.path.join(path, "compile_commands.json"), "w") as f:
+        json.dump(db, f)
+
+
+def clean_outputs(path):
+    for pattern in ("*.c_*.json", "*.c_test_*.c"):
+        for f in glob.glob(os.path.join(path, "src", "*", pattern)):
+            os.remove(f)
+
+
+def count_cases(path):
+    cases = 0
+    for f in glob.glob(os.path.join(path, "src", "*", "*.c_*.json")):
+        with open(f) as fp:
+            cases += len(json.load(fp))
+    return cases
+
+
+def run(path, jobs, tus):
+    """Run one full pipeline, return its measurements."""
+    clean_outputs(path)
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join([ROOT, env.get("PYTHONPATH", "")])
+    cmd = [sys.executable, "-m", "cut.cli", "-d", "compile_commands.json", "-j", str(jobs), "--no-cache"]
+    start = time.perf_counter()
+    proc = subprocess.Popen(cmd, cwd=path, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    # rusage of this run only: cut and the analyzers it waited for
+    _, status, usage = os.wait4(proc.pid, 0)
+    seconds = time.perf_counter() - start
+    returncode = os.WEXITSTATUS(status) if os.WIFEXITED(status) else -os.WTERMSIG(status)
+    cases = count_cases(path)
+    return {
+        "jobs": jobs,
+        "returncode": returncode,
+        "seconds": seconds,
+        "tus_per_second": tus / seconds,
+        "cases": cases,
+        "cases_per_second": cases / seconds,
+        # largest RSS of cut or any single analyzer, ru_maxrss is in KiB on Linux
+        "peak_rss_mib": usage.ru_maxrss / 1024,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tus", type=int, default=2000, help="translation units to generate")
+    parser.add_argument("--header-depth", type=int, default=32, help="length of the include chain")
+    parser.add_argument("--funcs", type=int, default=8, help="functions per translation unit")
+    parser.add_argument("--max-jobs", type=int, default=os.cpu_count() or 1, help="largest worker count")
+    parser.add_argument("--out", default=None, help="project directory, kept after the run")
+    parser.add_argument("--json", default=None, help="write the results to this file")
+    args = parser.parse_args(argv)
+
+    if shutil.which("clang") is None:
+        print("clang with the CaseFind checker must be on PATH")
+        return 1
+
+    path = os.path.abspath(args.out) if args.out else tempfile.mkdtemp(prefix="cut-scaling-")
+    generate_project(path, args.tus, args.header_depth, args.funcs)
+
+    jobs = []
+    j = 1
+    while j < args.max_jobs:
+        jobs.append(j)
+        j *= 2
+    jobs.append(args.max_jobs)
+
+    results = []
+    print(
+        "{:>6} {:>10} {:>8} {:>9} {:>10} {:>10}".format("jobs", "seconds", "TUs/s", "cases/s", "RSS MiB", "efficiency")
+    )
+    for j in jobs:
+        res = run(path, j, args.tus)
+        res["efficiency"] = results[0]["seconds"] / (j * res["seconds"]) if results else 1.0
+        results.append(res)
+        print(
+            "{jobs:>6} {seconds:>10.2f} {tus_per_second:>8.2f} {cases_per_second:>9.2f} "
+            "{peak_rss_mib:>10.1f} {efficiency:>10.2f}".format(**res)
+        )
+        if res["returncode"] != 0:
+            print("cut exited with {}".format(res["returncode"]))
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"tus": args.tus, "header_depth": args.header_depth, "funcs": args.funcs, "runs": results}, f)
+    if not args.out:
+        shutil.rmtree(path, ignore_errors=True)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,54 @@
+"""
+Start-up time budget of the cut CLI.
+
+Runs `cut --version` and `cut --help` in fresh interpreters and fails when the
+median wall-clock time of either goes over the budget:
+
+    python benchmarks/startup.py [--budget SECONDS] [--runs N]
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Seconds, for the median of one command including interpreter start-up.
+DEFAULT_BUDGET = 0.25
+
+
+def measure(argv, runs):
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join([ROOT, env.get("PYTHONPATH", "")])
+    cmd = [sys.executable, "-m", "cut.cli"] + argv
+    # warm the bytecode cache, a first run after install compiles every module
+    subprocess.run(cmd, stdout=subprocess.DEVNULL, env=env, check=True)
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(cmd, stdout=subprocess.DEVNULL, env=env, check=True)
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--budget", type=float, default=DEFAULT_BUDGET, help="seconds allowed per command")
+    parser.add_argument("--runs", type=int, default=10, help="runs per command")
+    args = parser.parse_args(argv)
+
+    ret = 0
+    for cmd in (["--version"], ["--help"]):
+        median = measure(cmd, args.runs)
+        status = "ok" if median <= args.budget else "OVER BUDGET"
+        print("cut {:<10} {:.3f}s (budget {:.3f}s) {}".format(" ".join(cmd), median, args.budget, status))
+        if median > args.budget:
+            ret = 1
+    return ret
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -71,6 +71,12 @@ class BuildAction:
         """
         return {"command": self.original_command, "directory": self.directory, "file": self.source}
 
+    def serialize(self):
+        """All the fields of this action, BuildAction(**action.serialize())
+        rebuilds an equal action.
+        """
+        return {key: getattr(self, key) for key in BuildAction.__slots__}
+
     def __hash__(self):
         """
         If the compilation database contains the same compilation action
@@ -0,0 +1,118 @@
+"""
+Content-addressed cache of clangsa case descriptions.
+
+The key of a translation unit is the hash of its preprocessed source, the
+analyzer options of the BuildAction and the analyzer version. The value is
+the set of <src>_<func>.json case descriptions emitted by the CaseFind
+checker for that translation unit.
+"""
+
+import glob
+import hashlib
+import os
+import shutil
+import subprocess
+import tempfile
+from typing import Dict, List, Optional
+
+from cut import logger
+
+LOG = logger.get_logger("system")
+
+
+def default_cache_dir() -> str:
+    cache_home = os.environ.get("XDG_CACHE_HOME", os.path.join(os.path.expanduser("~"), ".cache"))
+    return os.path.join(cache_home, "cut")
+
+
+def case_files(source: str) -> List[str]:
+    """Return the case description files emitted by the checker for source."""
+    return [f for f in glob.glob(glob.escape(source) + "_*.json") if os.path.isfile(f)]
+
+
+def analyzer_version(clang: str = "clang", env: dict = None) -> str:
+    """Identify the analyzer binary, so a rebuilt checker invalidates the cache."""
+    version = ""
+    try:
+        out = subprocess.run([clang, "--version"], stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, env=env)
+        version = out.stdout.decode("utf-8", errors="ignore")
+    except OSError:
+        pass
+    path = shutil.which(clang, path=(env or os.environ).get("PATH"))
+    if path:
+        st = os.stat(path)
+        version += "{}:{}:{}".format(os.path.realpath(path), st.st_size, st.st_mtime_ns)
+    return version
+
+
+class ResultCache:
+    def __init__(self, cache_dir: str, clangsa_cmd: List[str], env: dict = None) -> None:
+        self._cache_dir = cache_dir
+        self._clangsa_cmd = clangsa_cmd
+        self._env = env
+        self._version = analyzer_version(clangsa_cmd[0], env)
+
+    def _preprocess(self, act) -> Optional[bytes]:
+        cmd = [self._clangsa_cmd[0], "-E"]
+        cmd.extend(act.analyzer_options)
+        cmd.append(act.source)
+        try:
+            out = subprocess.run(
+                cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, cwd=act.directory, env=self._env
+            )
+        except OSError:
+            return None
+        if out.returncode != 0:
+            return None
+        return out.stdout
+
+    def key(self, act, extra: List[str] = ()) -> Optional[str]:
+        """
+        Compute the cache key of a BuildAction analyzed with extra analyzer options,
+        None if it can not be cached.
+        """
+        preprocessed = self._preprocess(act)
+        if preprocessed is None:
+            LOG.debug("can not preprocess {}, skip cache".format(act.source))
+            return None
+        sha = hashlib.sha256()
+        sha.update(preprocessed)
+        for item in [self._version, act.source] + self._clangsa_cmd + list(act.analyzer_options) + list(extra):
+            sha.update(b"\0")
+            sha.update(item.encode("utf-8"))
+        return sha.hexdigest()
+
+    def _entry(self, key: str) -> str:
+        return os.path.join(self._cache_dir, key[:2], key)
+
+    def restore(self, key: str, prefix: str) -> Optional[Dict[str, str]]:
+        """
+        Copy cached case descriptions to <prefix>_<func>.json,
+        return the file of each function or None on miss.
+        """
+        entry = self._entry(key)
+        if not os.path.isdir(entry):
+            return None
+        os.makedirs(os.path.dirname(os.path.abspath(prefix)), exist_ok=True)
+        cases = {}
+        for name in os.listdir(entry):
+            path = prefix + "_" + name
+            shutil.copyfile(os.path.join(entry, name), path)
+            cases[name[:-5]] = path
+        LOG.debug("cache hit {} for {}".format(key, prefix))
+        return cases
+
+    def store(self, key: str, cases: Dict[str, str]) -> None:
+        """Save the case description file of each function under key."""
+        entry = self._entry(key)
+        if os.path.isdir(entry):
+            return
+        os.makedirs(os.path.dirname(entry), exist_ok=True)
+        tmp = tempfile.mkdtemp(dir=os.path.dirname(entry))
+        for func_name, path in cases.items():
+            shutil.copyfile(path, os.path.join(tmp, func_name + ".json"))
+        try:
+            os.rename(tmp, entry)
+        except OSError:
+            # Another worker stored the same entry first.
+            shutil.rmtree(tmp, ignore_errors=True)
@@ -0,0 +1,131 @@
+"""
+Restrict a run to the translation units and functions changed since a git ref.
+"""
+
+import os
+import re
+import subprocess
+from typing import Dict, List, Optional, Tuple
+
+from clang.cindex import CursorKind, Index
+
+from cut import logger
+
+LOG = logger.get_logger("system")
+
+HEADER_EXTENSIONS = {".h", ".hh", ".hpp", ".hxx", ".h++", ".inc", ".def"}
+
+HUNK = re.compile(r"^@@ -\d+(?:,\d+)? \+(\d+)(?:,(\d+))? @@")
+
+# A whole file is changed, e.g. a new untracked file.
+WHOLE_FILE = None
+
+
+def _git(args: List[str], cwd: str) -> str:
+    out = subprocess.run(["git"] + args, stdout=subprocess.PIPE, cwd=cwd, check=True)
+    return out.stdout.decode("utf-8", errors="ignore")
+
+
+def changed_lines(ref: str, cwd: str = ".") -> Dict[str, Optional[List[Tuple[int, int]]]]:
+    """
+    Map each file changed in the working tree since ref to its changed line ranges
+    in the current version, or WHOLE_FILE.
+    """
+    top = _git(["rev-parse", "--show-toplevel"], cwd).strip()
+    changes = {}
+    path = None
+    # explicit prefixes, diff.noprefix or diff.mnemonicPrefix would change the ones name[2:] strips
+    diff = ["diff", "-U0", "--no-color", "--no-ext-diff", "--src-prefix=a/", "--dst-prefix=b/", ref, "--"]
+    for line in _git(diff, top).splitlines():
+        if line.startswith("+++ "):
+            name = line[4:]
+            path = None if name == "/dev/null" else os.path.realpath(os.path.join(top, name[2:]))
+            if path:
+                changes.setdefault(path, [])
+            continue
+        m = HUNK.match(line)
+        if m and path:
+            start = int(m.group(1))
+            count = 1 if m.group(2) is None else int(m.group(2))
+            # a pure deletion is reported at the line before the removed lines
+            changes[path].append((start, start + max(count, 1) - 1))
+    for name in _git(["ls-files", "--others", "--exclude-standard"], top).splitlines():
+        changes[os.path.realpath(os.path.join(top, name))] = WHOLE_FILE
+    return changes
+
+
+def _overlaps(start: int, end: int, ranges: List[Tuple[int, int]]) -> bool:
+    return any(start <= r_end and r_start <= end for r_start, r_end in ranges)
+
+
+def _covered(start: int, end: int, extents: List[Tuple[int, int]]) -> bool:
+    """Whether the sorted extents cover every line from start to end."""
+    for e_start, e_end in extents:
+        if e_start <= start <= e_end:
+            start = e_end + 1
+        if start > end:
+            return True
+    return False
+
+
+def changed_functions(act, ranges: List[Tuple[int, int]]) -> Optional[List[str]]:
+    """
+    Names of the functions defined in the source of act which overlap ranges, None if a range
+    reaches outside the function definitions: a global, a macro or a type may be used by any of them.
+    """
+    source = os.path.realpath(act.source)
+    # Bodies are needed, a skipped body drops the definition extent.
+    tu = Index.create().parse(act.source, act.analyzer_options)
+    names = []
+    extents = []
+    for child in tu.cursor.get_children():
+        if child.kind != CursorKind.FUNCTION_DECL or not child.is_definition():
+            continue
+        if child.location.file is None:
+            continue
+        if os.path.realpath(os.path.join(act.directory, child.location.file.name)) != source:
+            continue
+        extents.append((child.extent.start.line, child.extent.end.line))
+        if _overlaps(child.extent.start.line, child.extent.end.line, ranges):
+            names.append(child.spelling)
+    extents.sort()
+    if not all(_covered(start, end, extents) for start, end in ranges):
+        return None
+    return names
+
+
+def _dependencies(act, env: dict = None) -> List[str]:
+    """Files included by the source of act, as reported by the preprocessor."""
+    cmd = ["clang", "-M", "-MG"] + list(act.analyzer_options) + [act.source]
+    try:
+        out = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, cwd=act.directory, env=env)
+    except OSError:
+        return []
+    deps = out.stdout.decode("utf-8", errors="ignore").replace("\\\n", " ").split(":", 1)[-1].split()
+    return [os.path.realpath(os.path.join(act.directory, d)) for d in deps]
+
+
+def changed_scope(actions: list, ref: str, env: dict = None) -> Dict[str, Optional[List[str]]]:
+    """
+    Map the source of each BuildAction affected by the changes since ref to the
+    changed functions to analyze, None meaning the whole translation unit.
+    A translation unit changed outside its function definitions, or whose source did
+    not change but which includes a changed header, is analyzed as a whole.
+    """
+    changes = changed_lines(ref)
+    headers = {path for path in changes if os.path.splitext(path)[1] in HEADER_EXTENSIONS}
+    scope = {}
+    for act in actions:
+        source = os.path.realpath(act.source)
+        if source in changes:
+            ranges = changes[source]
+            if ranges is WHOLE_FILE:
+                scope[act.source] = None
+            else:
+                functions = changed_functions(act, ranges)
+                if functions is None or functions:
+                    scope[act.source] = functions
+        elif headers and headers.intersection(_dependencies(act, env)):
+            scope[act.source] = None
+    LOG.info("{} of {} translation units changed since {}".format(len(scope), len(actions), ref))
+    return scope
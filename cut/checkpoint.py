@@ -0,0 +1,96 @@
+"""
+Journal of a cut run, so an interrupted run can be resumed.
+
+Progress is appended to <report_dir>/cut_run.jsonl as it is made, one JSON
+line per event:
+    {"compile_db": "/abs/compile_commands.json"}
+    {"stage": "trace build"}
+    {"analyzed": "/abs/src/foo.c", "cases": {func: case description file}}
+    {"generated": "/abs/src/foo.c", "files": [...], "cases": {sha: id}}
+Each line is flushed on its own, so the journal survives the run being
+killed. A run with --resume replays the journal and skips what it records;
+any other run starts a new one.
+"""
+
+import json
+import os
+import threading
+
+from cut import logger
+
+LOG = logger.get_logger("system")
+
+RUN_FILE = "cut_run.jsonl"
+
+
+class Checkpoint:
+    def __init__(self, compile_db: str, report_dir: str = ".", resume: bool = False) -> None:
+        self._path = os.path.join(report_dir, RUN_FILE)
+        self._lock = threading.Lock()
+        self.stages = set()
+        # source -> case description file of each function
+        self.analyzed = {}
+        # source -> files generated from it
+        self.generated = {}
+        # dedup table of the cases generated so far
+        self.cases = {}
+        compile_db = os.path.abspath(compile_db)
+        if resume and self._replay(compile_db):
+            LOG.info(
+                "resume run: {} translation units analyzed, {} generated".format(
+                    len(self.analyzed), len(self.generated)
+                )
+            )
+            self._file = open(self._path, "a")
+        else:
+            self._file = open(self._path, "w")
+            self._write({"compile_db": compile_db})
+
+    def _replay(self, compile_db: str) -> bool:
+        try:
+            with open(self._path) as f:
+                lines = f.readlines()
+        except OSError:
+            LOG.info("no run to resume in {}".format(self._path))
+            return False
+        for i, line in enumerate(lines):
+            try:
+                event = json.loads(line)
+            except ValueError:
+                # the last line of a killed run may be incomplete
+                continue
+            if i == 0 and event.get("compile_db") != compile_db:
+                LOG.warning("{} belongs to a run on {}, start over".format(self._path, event.get("compile_db")))
+                return False
+            if "stage" in event:
+                self.stages.add(event["stage"])
+            elif "analyzed" in event:
+                self.analyzed[event["analyzed"]] = event.get("cases", {})
+            elif "generated" in event:
+                self.generated[event["generated"]] = event["files"]
+                self.cases.update(event["cases"])
+        return True
+
+    def _write(self, event: dict) -> None:
+        with self._lock:
+            self._file.write(json.dumps(event) + "\n")
+            self._file.flush()
+
+    def mark_stage(self, stage: str) -> None:
+        self.stages.add(stage)
+        self._write({"stage": stage})
+
+    def mark_analyzed(self, act, cases: dict) -> None:
+        self.analyzed[act.source] = cases
+        self._write({"analyzed": act.source, "cases": cases})
+
+    def mark_generated(self, act, files: list, cases: dict) -> None:
+        self.generated[act.source] = files
+        self.cases.update(cases)
+        self._write({"generated": act.source, "files": files, "cases": cases})
+
+    def files(self) -> list:
+        return [f for files in self.generated.values() for f in files]
+
+    def close(self) -> None:
+        self._file.close()
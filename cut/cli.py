@@ -1,27 +1,73 @@
 import argparse
 import json
 import os
+import resource
 import sys
-from pathlib import Path
 
-import simple_parsing
 import subprocess
 import signal
-from typing import List
+import threading
+import time
+from queue import Queue
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, List
 
 from cut.__version__ import __version__
 from cut import logger
-from cut import log_parser
-from cut import code_generator
-
-proc_pid = None
+from cut import metrics
+from cut import progress
+from cut import shard
+from cut import trace
+
+# Stages import their dependencies (libclang, pycparser, the log parser) on first use,
+# so that --help, --version and --client start fast.
+if TYPE_CHECKING:
+    from cut import checkpoint
+    from cut import context
+    from cut import manifest
+
+# pid -> whether the child leads its own process group
+proc_pids = {}
+proc_lock = threading.Lock()
+# set by the signal handler, no further analyzer is started then
+stop_requested = threading.Event()
+
+# Reduced analyzer budget for retrying a translation unit which hit a resource limit.
+RETRY_ANALYZER_OPTIONS = [
+    "-Xclang",
+    "-analyzer-config",
+    "-Xclang",
+    "max-nodes=25000",
+    "-Xclang",
+    "-analyzer-max-loop",
+    "-Xclang",
+    "2",
+]
+
+
+def _default_jobs() -> int:
+    """Number of CPUs usable by this process."""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+class _ArgumentParser(argparse.ArgumentParser):
+    """ArgumentParser accepting --foo_bar for every --foo-bar option."""
+
+    def add_argument(self, *args, **kwargs):
+        variants = list(args)
+        for arg in args:
+            if arg.startswith("--") and "-" in arg[2:]:
+                variants.append("--" + arg[2:].replace("-", "_"))
+        return super().add_argument(*variants, **kwargs)
 
 
 def _create_argument_parser() -> argparse.ArgumentParser:
     """Create ArgumentParser."""
 
-    parser = simple_parsing.ArgumentParser(
-        add_option_string_dash_variants=simple_parsing.DashVariant.UNDERSCORE_AND_DASH,
+    parser = _ArgumentParser(
         description="Kut is a kernel unit test generation framework for Linux kernel code",
         fromfile_prefix_chars="@",
     )
@@ -59,15 +105,266 @@ def _create_argument_parser() -> argparse.ArgumentParser:
         "-g",
         "--generate",
         dest="generate",
-        required=True,
+        required=False,
         default=None,
         type=str,
         help="generate cases after build scripts. e.g. : cut -g 'make'",
     )
 
+    parser.add_argument(
+        "-d",
+        "--compile-db",
+        dest="compile_db",
+        required=False,
+        default=None,
+        type=str,
+        help="use an existing compilation database instead of tracing the build. "
+        "e.g. : cut -d build/compile_commands.json",
+    )
+
+    parser.add_argument(
+        "--file",
+        dest="files",
+        action="append",
+        default=None,
+        type=str,
+        help="only analyze source files matching this glob, may be repeated. e.g. : --file 'drivers/net/*.c'",
+    )
+
+    parser.add_argument(
+        "--function",
+        dest="functions",
+        action="append",
+        default=None,
+        type=str,
+        help="only generate cases for functions with this name or matching this regex, may be repeated",
+    )
+
+    parser.add_argument(
+        "--since",
+        dest="since",
+        required=False,
+        default=None,
+        type=str,
+        help="only analyze translation units and functions changed since this git ref. e.g. : --since origin/master",
+    )
+
+    parser.add_argument(
+        "--shard",
+        dest="shard",
+        required=False,
+        default=None,
+        type=shard.parse_shard,
+        help="only process the K-th of N deterministic slices of the translation units. e.g. : --shard 1/4",
+    )
+
+    parser.add_argument(
+        "--merge",
+        dest="merge",
+        nargs="+",
+        default=None,
+        type=str,
+        help="merge the results of --shard runs from these directories into the current directory",
+    )
+
+    parser.add_argument(
+        "--serve",
+        dest="serve",
+        required=False,
+        default=None,
+        type=str,
+        help="run as a daemon keeping the knowledge base warm, serving jobs on this Unix socket",
+    )
+
+    parser.add_argument(
+        "--client",
+        dest="client",
+        required=False,
+        default=None,
+        type=str,
+        help="send a job for --file and --function to the daemon on this Unix socket",
+    )
+
+    parser.add_argument(
+        "--trace-out",
+        dest="trace_out",
+        required=False,
+        default=None,
+        type=str,
+        help="write per stage, translation unit, function and case timings as Chrome trace-event JSON",
+    )
+
+    parser.add_argument(
+        "--resume",
+        dest="resume",
+        action="store_true",
+        help="continue an interrupted run, skipping the work recorded in cut_run.jsonl",
+    )
+
+    parser.add_argument(
+        "--metrics-out",
+        dest="metrics_out",
+        required=False,
+        default=None,
+        type=str,
+        help="write run metrics in Prometheus text format to this file, e.g. for a node-exporter textfile collector",
+    )
+
+    parser.add_argument(
+        "--progress-json",
+        dest="progress_json",
+        required=False,
+        default=None,
+        type=str,
+        help="append progress, throughput and ETA as JSON lines to this file, - for stdout",
+    )
+
+    parser.add_argument(
+        "--progress-interval",
+        dest="progress_interval",
+        required=False,
+        default=10.0,
+        type=float,
+        help="seconds between two progress JSON lines",
+    )
+
+    parser.add_argument(
+        "--no-progress",
+        dest="no_progress",
+        action="store_true",
+        help="do not show the progress status line on a terminal",
+    )
+
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        dest="jobs",
+        required=False,
+        default=_default_jobs(),
+        type=int,
+        help="number of analyzer processes to run in parallel, default is the number of usable CPUs",
+    )
+
+    parser.add_argument(
+        "--harvest-jobs",
+        dest="harvest_jobs",
+        required=False,
+        default=None,
+        type=int,
+        help="number of processes harvesting the knowledge base while the analyzers run, "
+        "default is the usable CPUs left by -j, at least 1",
+    )
+
+    parser.add_argument(
+        "--timeout",
+        dest="timeout",
+        required=False,
+        default=None,
+        type=float,
+        help="wall-clock limit in seconds for each analyzer invocation",
+    )
+
+    parser.add_argument(
+        "--max-memory",
+        dest="max_memory",
+        required=False,
+        default=None,
+        type=int,
+        help="address space limit in MiB for each analyzer invocation",
+    )
+
+    parser.add_argument(
+        "--out-dir",
+        dest="out_dir",
+        required=False,
+        default=None,
+        type=str,
+        help="write case descriptions, test files and cut_manifest.json to this directory instead of the source tree",
+    )
+
+    parser.add_argument(
+        "--cache-dir",
+        dest="cache_dir",
+        required=False,
+        default=None,
+        type=str,
+        help="directory of the incremental analysis cache, default is ~/.cache/cut",
+    )
+
+    parser.add_argument(
+        "--knowledge-base",
+        dest="knowledge_base",
+        default="index",
+        choices=["index", "memory", "lazy"],
+        help="index keeps the harvested symbols in a SQLite index in the cache directory and only parses "
+        "changed translation units again, memory parses all of them on every run, "
+        "lazy only parses a translation unit when cases are generated for it",
+    )
+
+    parser.add_argument(
+        "--no-cache",
+        dest="no_cache",
+        action="store_true",
+        help="always run the analyzer, neither read nor update the cache",
+    )
+
     return parser
 
 
+# run_clangsa analyzer results besides the process exit code
+TIMEOUT = -1000
+RESOURCE_LIMIT = -1001
+INTERRUPTED = -1002
+
+
+def _kill_proc(pid: int, is_group: bool, sig: int) -> None:
+    try:
+        if is_group:
+            os.killpg(pid, sig)
+        else:
+            os.kill(pid, sig)
+    except ProcessLookupError:
+        pass
+
+
+def _run_proc(cmd: List[str], cwd: str = None, env: dict = None, timeout: float = None, max_memory: int = None) -> int:
+    """
+    Run a child process, keeping its pid registered so it can be interrupted.
+
+    With timeout or max_memory (bytes of address space) the child runs in its own process group,
+    which is killed as a whole when the wall-clock limit is hit; subprocess.TimeoutExpired is raised then.
+    """
+    limited = timeout is not None or max_memory is not None
+    proc = subprocess.Popen(cmd, encoding="utf=8", errors="ignore", cwd=cwd, env=env, start_new_session=limited)
+    with proc_lock:
+        proc_pids[proc.pid] = limited
+    try:
+        if max_memory is not None:
+            # set from the parent, a preexec_fn may deadlock the child while other threads run
+            try:
+                resource.prlimit(proc.pid, resource.RLIMIT_AS, (max_memory, max_memory))
+            except ProcessLookupError:
+                pass
+        proc.wait(timeout=timeout)
+    except subprocess.TimeoutExpired:
+        _kill_proc(proc.pid, True, signal.SIGKILL)
+        proc.wait()
+        raise
+    finally:
+        with proc_lock:
+            proc_pids.pop(proc.pid, None)
+    return proc.returncode
+
+
+def _hit_limit(ret: int) -> bool:
+    """
+    Whether an analyzer exit status means it was killed or ran out of memory, rather than
+    failed on the source: killed by a signal, crashed in the in-process frontend (128 + signal,
+    e.g. abort on a failed allocation) or stopped by an LLVM fatal error such as "out of memory" (70).
+    """
+    return ret < 0 or ret > 128 or ret == 70
+
+
 def run_checker(env: dict = None, args: argparse.Namespace = None) -> int:
     """Run CodeChecker to trace compile commands, stored in codechecker_commands.json."""
 
@@ -76,32 +373,41 @@ def run_checker(env: dict = None, args: argparse.Namespace = None) -> int:
     env["CC_LOGGER_GCC_LIKE"] = "gcc:g++:clang:clang++:cc:c++:ld"
     checker_cmd = ["CodeChecker", "log", "-b", args.generate, "-o", "codechecker_commands.json"]
 
-    proc = subprocess.Popen(checker_cmd, encoding="utf=8", errors="ignore", env=env)
-    global proc_pid
-    proc_pid = proc.pid
-    proc.wait()
+    ret = _run_proc(checker_cmd, env=env)
     LOG = logger.get_logger("system")
-    if proc.returncode != 0:
+    if ret != 0:
         LOG.error("run CodeChecker failed! args : {}".format(checker_cmd))
-    return proc.returncode
-
-
-def parse_build_json() -> dict:
-    ret = {}
-    with open("codechecker_commands.json") as f:
-        build_cmds = json.load(f)
-        return build_cmds
     return ret
 
 
-def run_clangsa(env: dict = None, args: argparse.Namespace = None) -> int:
-    """Run Clang Static Analysis to generate case description json, stored in each xx.c_funcname.json."""
-    build_dict = parse_build_json()
-    actions, skipped_cmp_cmd_count = log_parser.parse_unique_log(build_dict, ".")
-    print(build_dict)
-    print(type(actions))
+def run_clangsa(
+    env: dict = None,
+    args: argparse.Namespace = None,
+    ctx: "context.RunContext" = None,
+    on_done=None,
+    checkpoint: "checkpoint.Checkpoint" = None,
+    manifest: "manifest.Manifest" = None,
+) -> int:
+    """
+    Run Clang Static Analysis to generate case description json, stored in each xx.c_funcname.json
+    and moved to the output directory of the manifest, which records them.
+    on_done is called with each successfully analyzed BuildAction as soon as it finishes.
+    BuildActions the checkpoint records as analyzed are skipped, and only passed to on_done
+    if no test files were generated from them yet.
+    """
+    from cut import cache
+    from cut import context
+    from cut import history
+    from cut import manifest as mf
+
+    if ctx is None:
+        ctx = context.RunContext("codechecker_commands.json", args.out_dir or ".")
+    if manifest is None:
+        manifest = mf.Manifest(args.out_dir)
+    actions = ctx.actions
+    LOG = logger.get_logger("system")
     for act in actions:
-        print(str(act))
+        LOG.debug(str(act))
     clangsa_cmd = [
         "clang",
         "--analyze",
@@ -113,32 +419,284 @@ def run_clangsa(env: dict = None, args: argparse.Namespace = None) -> int:
         "/usr/lib/clang/16.0.0/include",
     ]
 
-    LOG = logger.get_logger("system")
     LOG.info("!!!!!start clangsa case generator!!!!!")
-    for act in actions:
+    result_cache = None
+    if not args.no_cache:
+        result_cache = cache.ResultCache(args.cache_dir or cache.default_cache_dir(), clangsa_cmd, env)
+    runs = history.open_history(args.cache_dir or cache.default_cache_dir())
+    cache_hits = []
+    resumed = []
+    timed_out = []
+    timeout = args.timeout
+    max_memory = args.max_memory * 1024 * 1024 if args.max_memory else None
+
+    def run_limited(cmd, act):
+        with trace.span("analyze", "tu", source=act.source):
+            try:
+                ret = _run_proc(cmd, cwd=act.directory, env=env, timeout=timeout, max_memory=max_memory)
+            except subprocess.TimeoutExpired:
+                return TIMEOUT
+        if max_memory is not None and _hit_limit(ret):
+            return RESOURCE_LIMIT
+        return ret
+
+    def analyze_one(act, extra):
         each_cmd = []
         each_cmd.extend(clangsa_cmd)
         each_cmd.extend(act.analyzer_options)
+        each_cmd.extend(extra)
         each_cmd.append(act.source)
-        LOG.info(each_cmd)
-        proc = subprocess.Popen(each_cmd, encoding="utf=8", errors="ignore", cwd=act.directory, env=env)
-        global proc_pid
-        proc_pid = proc.pid
-        proc.wait()
-        if proc.returncode != 0:
+        LOG.debug(each_cmd)
+        ret = run_limited(each_cmd, act)
+        if stop_requested.is_set():
+            # killed by the stop, or finished while it happened
+            return INTERRUPTED, False
+        retried = ret in (RESOURCE_LIMIT, TIMEOUT)
+        if retried:
+            LOG.warning("clangsa hit its limits, retry with reduced budget : {}".format(act.source))
+            retry_cmd = each_cmd[:-1] + RETRY_ANALYZER_OPTIONS + each_cmd[-1:]
+            ret = run_limited(retry_cmd, act)
+        if ret != 0:
             LOG.error("run clangsa failed! args : {}".format(each_cmd))
-            return proc.returncode
+        return ret, retried
+
+    def finished(act, cases, journal=True):
+        if stop_requested.is_set():
+            # may be the output of an analyzer killed by the stop, --resume analyzes it again
+            return
+        if checkpoint and journal:
+            checkpoint.mark_analyzed(act, cases)
+        if on_done:
+            on_done(act)
+
+    def analyze(act):
+        if stop_requested.is_set():
+            return INTERRUPTED
+        if checkpoint and act.source in checkpoint.analyzed:
+            resumed.append(act.source)
+            metrics.TRANSLATION_UNITS.inc(result="resumed")
+            progress.PROGRESS.tu_done(cached=True)
+            if on_done and act.source not in checkpoint.generated:
+                on_done(act)
+            return 0
+        functions = ctx.selection.analyze_functions(act.source)
+        if functions is None:
+            invocations = [[]]
+        else:
+            invocations = [["-Xclang", "-analyze-function=" + name] for name in functions]
+        key = None
+        if result_cache:
+            with trace.span("cache lookup", "tu", source=act.source):
+                key = result_cache.key(act, [opt for extra in invocations for opt in extra])
+                cases = result_cache.restore(key, manifest.prefix(act.source)) if key else None
+            if cases is not None:
+                manifest.add_cases(act.source, cases)
+                cache_hits.append(act.source)
+                metrics.TRANSLATION_UNITS.inc(result="cached")
+                progress.PROGRESS.tu_done(cached=True)
+                finished(act, cases)
+                return 0
+        # Drop stale descriptions so only this run's output is collected.
+        for f in cache.case_files(act.source):
+            os.remove(f)
+        ret = 0
+        reduced = False
+        start = time.perf_counter()
+        for extra in invocations:
+            if stop_requested.is_set():
+                return INTERRUPTED
+            each_ret, retried = analyze_one(act, extra)
+            if each_ret == INTERRUPTED:
+                return INTERRUPTED
+            if retried:
+                # results of a reduced budget are not cached nor journaled, a later run redoes them
+                key = None
+                reduced = True
+            if each_ret != 0:
+                ret = each_ret
+        seconds = time.perf_counter() - start
+        metrics.ANALYZER_SECONDS.observe(seconds)
+        if ret == TIMEOUT:
+            timed_out.append(act.source)
+        if ret == 0:
+            metrics.TRANSLATION_UNITS.inc(result="succeeded")
+        else:
+            metrics.TRANSLATION_UNITS.inc(result="timed_out" if ret == TIMEOUT else "failed")
+            metrics.FAILURES.inc(stage="analyze")
+        progress.PROGRESS.tu_done(ok=ret == 0)
+        if ret == 0:
+            cases = manifest.collect(act.source)
+            # only full analyses of a translation unit are comparable with each other
+            if runs and functions is None:
+                count = 0
+                for path in cases.values():
+                    with open(path) as fp:
+                        count += len(json.load(fp))
+                runs.record(act, seconds, count)
+            if key:
+                result_cache.store(key, cases)
+            finished(act, cases, journal=not reduced)
+        return ret
 
+    jobs = max(1, args.jobs)
+    actions = history.longest_first(actions, runs)
+    progress.PROGRESS.set_total(len(actions))
+    try:
+        with trace.span("analyze", "stage"), ThreadPoolExecutor(max_workers=jobs) as pool:
+            results = list(pool.map(analyze, actions))
+    finally:
+        if runs:
+            runs.close()
+
+    failed = [act.source for act, ret in zip(actions, results) if ret not in (0, INTERRUPTED)]
+    interrupted = results.count(INTERRUPTED)
+    LOG.info(
+        "clangsa finished: {} succeeded ({} from cache, {} resumed), {} failed ({} timed out), {} interrupted".format(
+            len(actions) - len(failed) - interrupted,
+            len(cache_hits),
+            len(resumed),
+            len(failed),
+            len(timed_out),
+            interrupted,
+        )
+    )
+    for source in failed:
+        LOG.info("  {} : {}".format("timed out" if source in timed_out else "failed", source))
+    # every translation unit ran, the failed ones still fail the run
+    if failed:
+        return 1
     return 0
 
 
-def run_codegen(env: dict = None, args: argparse.Namespace = None) -> int:
+def _harvest_jobs(args: argparse.Namespace) -> int:
+    """Harvest processes next to the -j analyzers, so both together do not oversubscribe the CPUs."""
+    if args.harvest_jobs is not None:
+        return max(1, args.harvest_jobs)
+    return max(1, _default_jobs() - max(1, args.jobs))
+
+
+def _knowlege_base(args: argparse.Namespace, actions: list, jobs: int = None):
+    """
+    The knowledge base of actions as chosen by --knowledge-base, harvested
+    in jobs processes, -j by default.
+    """
+    from cut import cache
+    from cut import knowlege
+
+    if jobs is None:
+        jobs = args.jobs
+    if args.knowledge_base == "lazy":
+        return knowlege.LazyKnowlegeBase(actions)
+    if args.knowledge_base == "index" and not args.no_cache:
+        from cut import symbol_index
+
+        return symbol_index.open_index(args.cache_dir or cache.default_cache_dir(), actions, jobs)
+    return knowlege.KnowlegeBase(actions, jobs)
+
+
+def run_codegen(env: dict = None, args: argparse.Namespace = None, ctx: "context.RunContext" = None) -> int:
     """
     Run test case code generator, Each input json with a test c source code output.
     For example, CodeGenerator parses xx.c_funcname.json then generate xx.c_funcname_test.c.
     """
-    cgen = code_generator.CodeGenerator("codechecker_commands.json")
-    ret = cgen.generate()
+    from cut import code_generator
+    from cut import context
+    from cut import manifest as mf
+    from cut import test_case
+
+    out_dir = args.out_dir if args else None
+    if ctx is None:
+        ctx = context.RunContext("codechecker_commands.json", out_dir or ".")
+    manifest = mf.Manifest.load(out_dir)
+    knowlege_base = _knowlege_base(args, ctx.actions) if args else None
+    cgen = code_generator.CodeGenerator(ctx.actions, ctx.selection, knowlege_base, manifest)
+    cgen.generate()
+    if manifest:
+        manifest.save()
+    if args and args.shard:
+        shard.write_manifest(args.shard, cgen.generated, dict(test_case.case_hash), out_dir or ".")
+    return 0
+
+
+def run_pipeline(
+    env: dict = None,
+    args: argparse.Namespace = None,
+    ctx: "context.RunContext" = None,
+    checkpoint: "checkpoint.Checkpoint" = None,
+) -> int:
+    """
+    Run analysis and code generation as a streaming pipeline.
+    Each translation unit is queued to the code generator as soon as the analyzer finished it,
+    while the knowledge base is harvested concurrently with the first analyzer jobs.
+    Progress is recorded to the checkpoint, work it already records is skipped.
+    """
+    from cut import code_generator
+    from cut import manifest as mf
+    from cut import test_case
+
+    LOG = logger.get_logger("system")
+    pending = Queue()
+    manifest = mf.Manifest(args.out_dir)
+    if checkpoint:
+        test_case.case_hash.update(checkpoint.cases)
+        for source, cases in checkpoint.analyzed.items():
+            manifest.add_cases(source, cases)
+            files = checkpoint.generated.get(source, ())
+            for func_name in cases:
+                test_file = manifest.test_file(source, func_name)
+                if test_file in files:
+                    manifest.add_test(source, func_name, test_file)
+
+    # set when the code generator can not run at all
+    codegen_failed = threading.Event()
+
+    def codegen():
+        try:
+            with trace.span("knowledge base", "stage"):
+                # the analyzers run meanwhile
+                knowlege_base = _knowlege_base(args, ctx.actions, _harvest_jobs(args))
+        except Exception:
+            LOG.exception("build knowledge base failed!")
+            metrics.FAILURES.inc(stage="codegen")
+            codegen_failed.set()
+            return
+        cgen = code_generator.CodeGenerator(ctx.actions, ctx.selection, knowlege_base, manifest)
+        while True:
+            act = pending.get()
+            if act is None:
+                break
+            files = len(cgen.generated)
+            cases = len(test_case.case_hash)
+            try:
+                cgen.generate_action(act)
+            except Exception:
+                LOG.exception("generate cases failed! source : {}".format(act.source))
+                metrics.FAILURES.inc(stage="codegen")
+                continue
+            if checkpoint:
+                # the dedup table only grows at its end
+                new_cases = list(test_case.case_hash.items())[cases:]
+                checkpoint.mark_generated(act, cgen.generated[files:], dict(new_cases))
+
+    # Cases share one dedup table, so a single generator thread consumes the queue.
+    worker = threading.Thread(target=codegen, name="codegen", daemon=True)
+    tty = sys.stderr.isatty() and not args.no_progress
+    if tty or args.progress_json:
+        progress.start(tty, args.progress_json, args.progress_interval)
+    try:
+        worker.start()
+        ret = run_clangsa(env, args, ctx, on_done=pending.put, checkpoint=checkpoint, manifest=manifest)
+        pending.put(None)
+        worker.join()
+    finally:
+        progress.PROGRESS.stop()
+    manifest.save()
+    if codegen_failed.is_set():
+        return ret or 1
+    if checkpoint and not stop_requested.is_set():
+        checkpoint.mark_stage("generate")
+    if args.shard:
+        shard.write_manifest(args.shard, manifest.files(), dict(test_case.case_hash), args.out_dir or ".")
     return ret
 
 
@@ -147,9 +705,11 @@ def run_cmd(env: dict = None, args: argparse.Namespace = None) -> int:
     Run commands to generate cases.
     Steps:
         1. Run CodeChecker to trace compile commands, stored in codechecker_commands.json.
+           Skipped when an existing compilation database is given with -d/--compile-db.
         2. Run Clang Static Analysis to generate case description json, stored in each xx.c_funcname.json.
-        3. Generate case source codes based on 2.
+        3. Generate case source codes based on 2, streamed per translation unit as 2 finishes it.
         4. Generate case Makefiles.
+    Each finished step and translation unit is recorded in cut_run.jsonl, which --resume continues from.
 
     Args:
         env: environment for cmds.
@@ -158,16 +718,52 @@ def run_cmd(env: dict = None, args: argparse.Namespace = None) -> int:
     Returns:
         An integer representing the success of the program run.
     """
-    ret = run_checker(env, args)
-    if ret != 0:
-        return ret
-    ret = run_clangsa(env, args)
-    if ret != 0:
-        return ret
-    ret = run_codegen(env, args)
-    if ret != 0:
-        return ret
-    return 0
+    from cut import checkpoint as ckpt
+    from cut import context
+    from cut import selection as sel
+
+    selection = sel.Selection(args.files, args.functions, args.shard)
+    # the run journal, parsed actions and compiler info go to the output directory too
+    report_dir = args.out_dir or "."
+    os.makedirs(report_dir, exist_ok=True)
+    # a daemon serves many runs, none of which is resumed
+    checkpoint = None
+    if not args.serve:
+        checkpoint = ckpt.Checkpoint(args.compile_db or "codechecker_commands.json", report_dir, args.resume)
+    if args.compile_db:
+        ctx = context.RunContext(args.compile_db, report_dir, selection)
+    else:
+        if checkpoint and "trace build" in checkpoint.stages and os.path.isfile("codechecker_commands.json"):
+            logger.get_logger("system").info("resume run: build already traced")
+        else:
+            with trace.span("trace build", "stage"):
+                ret = run_checker(env, args)
+            if ret != 0:
+                metrics.FAILURES.inc(stage="trace_build")
+                return ret
+            if checkpoint:
+                checkpoint.mark_stage("trace build")
+        ctx = context.RunContext("codechecker_commands.json", report_dir, selection)
+    with trace.span("parse compile db", "stage"):
+        ctx.parse()
+    if args.since:
+        from cut import changes
+
+        with trace.span("changes", "stage"):
+            try:
+                scope = changes.changed_scope(ctx.all_actions, args.since, env)
+            except (OSError, subprocess.CalledProcessError) as e:
+                logger.get_logger("system").error("can not list the changes since {}: {}".format(args.since, e))
+                return 1
+        selection.restrict(scope)
+    if args.serve:
+        from cut import daemon
+
+        return daemon.serve(args.serve, ctx, env, args)
+    try:
+        return run_pipeline(env, args, ctx, checkpoint)
+    finally:
+        checkpoint.close()
 
 
 def main(argv: List[str] = None) -> int:
@@ -194,22 +790,52 @@ def main(argv: List[str] = None) -> int:
     logger.setup_logger(args.verbosity)
     LOG = logger.get_logger("system")
 
-    if args.generate is None:
-        LOG.error("FLAG -g/--generate must be specified!")
-        sys.argv.append("--help")
+    if args.merge:
+        return shard.merge(args.merge, ".")
+    if args.client:
+        from cut import daemon
+
+        if not args.files:
+            LOG.error("FLAG --file must be specified with --client!")
+            return 1
+        ret = 0
+        for f in args.files:
+            reply = daemon.request(
+                args.client, {"command": "generate", "file": os.path.abspath(f), "functions": args.functions}
+            )
+            print(json.dumps(reply))
+            ret = ret or reply["status"]
+        return ret
+    if args.generate is None and args.compile_db is None:
+        LOG.error("FLAG -g/--generate or -d/--compile-db must be specified!")
+        argparser.print_help()
+        return 1
+    if args.compile_db and not os.path.isfile(args.compile_db):
+        LOG.error("compilation database {} does not exist!".format(args.compile_db))
+        return 1
 
     original_env = os.environ.copy()
 
     def signal_term_handler(signum, frame):
-        global proc_pid
-        if proc_pid:
-            os.kill(proc_pid, signal.SIGINT)
+        # finished work is already in the run journal, keep it for --resume
+        stop_requested.set()
+        for pid, is_group in list(proc_pids.items()):
+            _kill_proc(pid, is_group, signal.SIGINT)
         sys.exit(128 + signum)
 
     signal.signal(signal.SIGTERM, signal_term_handler)
     signal.signal(signal.SIGINT, signal_term_handler)
-    run_cmd(original_env, args)
-    return 0
+    if args.trace_out:
+        trace.enable()
+    try:
+        with trace.span("total", "stage"):
+            ret = run_cmd(original_env, args)
+    finally:
+        if args.trace_out:
+            trace.save(args.trace_out)
+        if args.metrics_out:
+            metrics.save(args.metrics_out)
+    return ret
 
 
 if __name__ == "__main__":
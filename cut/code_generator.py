@@ -1,47 +1,84 @@
 from cut import test_case as case
+from cut import cache
 from cut import knowlege
-from cut import log_parser
+from cut import context
+from cut import logger
+from cut import metrics
+from cut import progress
+from cut import selection as sel
+from cut import trace
 import json
 
-import os
+LOG = logger.get_logger("system")
 
 
 class CodeGenerator:
-    def __init__(self, jfile: str) -> None:
-        self._jfile = jfile
-        self._knowlege = knowlege.KnowlegeBase(jfile)
+    def __init__(
+        self, actions: list, selection: sel.Selection = None, knowlege_base=None, manifest=None, jobs: int = 1
+    ) -> None:
+        self._actions = actions
+        self._selection = selection if selection is not None else sel.Selection()
+        # where the case descriptions are, without one they are looked up next to the sources
+        self._manifest = manifest
+        # case descriptions read and test files written
+        self.generated = []
+        if knowlege_base is None:
+            with trace.span("knowledge base", "stage"):
+                knowlege_base = knowlege.KnowlegeBase(actions, jobs)
+        self._knowlege = knowlege_base
 
     def generate(self) -> None:
-        jdata = json.load(open(self._jfile))
-        actions, _ = log_parser.parse_unique_log(jdata, ".", compile_uniqueing="strict")
-        for act in actions:
-            src_path = os.path.abspath(os.path.dirname(act.source))
-            filename = os.path.basename(act.source)
-            for f in os.listdir(src_path):
-                f = os.path.join(src_path, f)
-                if os.path.isfile(f) and filename in f and f.endswith(".json"):
-                    print(f)
-                    func_name = f[:-5]
-                    cur = func_name.rfind(".c")
-                    func_name = func_name[cur + 3 :]
-                    cases = self.generateCases(f, func_name)
+        for act in self._actions:
+            self.generate_action(act)
+
+    def generate_action(self, act) -> None:
+        """Generate the test files of one translation unit from its case descriptions."""
+        if self._manifest is not None:
+            case_files = self._manifest.case_files(act.source)
+        else:
+            prefix = len(act.source) + 1
+            case_files = {f[prefix:-5]: f for f in cache.case_files(act.source)}
+        with trace.span("codegen", "tu", source=act.source):
+            for func_name, f in case_files.items():
+                if not self._selection.match_function(act.source, func_name):
+                    continue
+                with trace.span("codegen", "func", function=func_name, source=act.source):
+                    cases = self.generateCases(f, func_name, act.source)
                     self.save_to_file(cases, act.source, func_name)
+                    self.generated.append(f)
+                emitted = len([item for item in cases if item])
+                metrics.CASES.inc(emitted)
+                progress.PROGRESS.function_done(emitted)
 
     def save_to_file(self, cases, source, func_name):
-        test_file = source + "_test_" + func_name + ".c"
+        if self._manifest is not None:
+            test_file = self._manifest.test_file(source, func_name)
+        else:
+            test_file = source + "_test_" + func_name + ".c"
         with open(test_file, "w") as f:
             for item in cases:
-                f.write(item)
+                # duplicated or unresolved cases are None
+                if item:
+                    f.write(item)
+        if self._manifest is not None:
+            self._manifest.add_test(source, func_name, test_file)
+        self.generated.append(test_file)
+        LOG.debug("generated {}".format(test_file))
 
-    def generateCases(self, f, func_name):
+    def generateCases(self, f, func_name, source=None):
         case_asts = []
         case_descs = json.load(open(f))
-        for case_desc in case_descs:
-            test_case = case.TestCase(func_name, case_desc, self._knowlege)
-            case_asts.append(test_case.generate_func())
+        # static symbols of the translation unit shadow the ones of other translation units
+        knowlege_base = self._knowlege.scope(source) if source else self._knowlege
+        for i, case_desc in enumerate(case_descs):
+            with trace.span("case", "case", function=func_name, index=i):
+                test_case = case.TestCase(func_name, case_desc, knowlege_base)
+                if test_case.duplicated:
+                    metrics.DUPLICATED.inc()
+                case_asts.append(test_case.generate_func())
         return case_asts
 
 
 if __name__ == "__main__":
-    cgen = CodeGenerator("codechecker_commands.json")
+    cgen = CodeGenerator(context.RunContext("codechecker_commands.json").actions)
     cgen.generate()
@@ -0,0 +1,116 @@
+"""
+State shared by the stages of one cut run.
+"""
+
+import json
+import os
+from typing import List
+
+from cut import log_parser
+from cut import logger
+from cut import selection as sel
+from cut.build_action import BuildAction
+
+LOG = logger.get_logger("system")
+
+ACTIONS_FILE = "cut_build_actions.json"
+
+
+def _db_stamp(jfile: str) -> list:
+    st = os.stat(jfile)
+    return [os.path.abspath(jfile), st.st_size, st.st_mtime_ns]
+
+
+class RunContext:
+    """
+    Parses the compilation database once and hands the same BuildAction list
+    to the analyzer, the knowledge base and the code generator.
+
+    The parsed actions are also saved to <report_dir>/cut_build_actions.json,
+    so a stage started on its own skips parsing as long as the compilation
+    database did not change.
+
+    actions only contains the BuildActions matched by selection, while the
+    saved file always holds the whole compilation database.
+    """
+
+    def __init__(
+        self, jfile: str = "codechecker_commands.json", report_dir: str = ".", selection: sel.Selection = None
+    ) -> None:
+        self._jfile = jfile
+        self._report_dir = report_dir
+        self._all_actions = None
+        self._actions = None
+        self._stamp = None
+        self.selection = selection if selection is not None else sel.Selection()
+
+    @property
+    def jfile(self) -> str:
+        return self._jfile
+
+    @property
+    def report_dir(self) -> str:
+        return self._report_dir
+
+    def with_selection(self, selection: sel.Selection) -> "RunContext":
+        """A context over the same parsed compilation database with another selection."""
+        ctx = RunContext(self._jfile, self._report_dir, selection)
+        ctx._all_actions = self.all_actions
+        ctx._stamp = self._stamp
+        return ctx
+
+    def is_stale(self) -> bool:
+        """Whether the compilation database changed since it was parsed."""
+        try:
+            return self._all_actions is not None and self._stamp != _db_stamp(self._jfile)
+        except OSError:
+            return True
+
+    @property
+    def actions_file(self) -> str:
+        return os.path.join(self._report_dir, ACTIONS_FILE)
+
+    def parse(self) -> List[BuildAction]:
+        """Parse the compilation database, or load it from the actions file, unless done before."""
+        if self._all_actions is None:
+            self._stamp = _db_stamp(self._jfile)
+            self._all_actions = self._load()
+            if self._all_actions is None:
+                self._all_actions = self._parse()
+                self._save()
+        return self._all_actions
+
+    @property
+    def all_actions(self) -> List[BuildAction]:
+        return self.parse()
+
+    @property
+    def actions(self) -> List[BuildAction]:
+        if self._actions is None:
+            self._actions = self.selection.select_actions(self.all_actions)
+        return self._actions
+
+    def _parse(self) -> List[BuildAction]:
+        with open(self._jfile) as f:
+            jdata = json.load(f)
+        actions, _ = log_parser.parse_unique_log(jdata, self._report_dir, compile_uniqueing="strict")
+        return actions
+
+    def _load(self):
+        try:
+            with open(self.actions_file) as f:
+                jdata = json.load(f)
+            if jdata["database"] != self._stamp:
+                return None
+            actions = [BuildAction(**item) for item in jdata["actions"]]
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+        LOG.debug("load build actions from {}".format(self.actions_file))
+        return actions
+
+    def _save(self) -> None:
+        jdata = {"database": self._stamp, "actions": [act.serialize() for act in self._all_actions]}
+        tmp = self.actions_file + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(jdata, f)
+        os.replace(tmp, self.actions_file)
@@ -0,0 +1,154 @@
+"""
+Long-running cut server keeping the parsed compilation database and the
+knowledge base warm in memory.
+
+Jobs are JSON lines sent over a Unix socket, each answered by one JSON line:
+    {"command": "generate", "file": "src/foo.c", "functions": ["foo"]}
+    -> {"status": 0, "files": ["/abs/src/foo.c_test_foo.c"]}
+    {"command": "shutdown"}
+Only the server side imports the pipeline, so a client starts fast.
+Translation units whose source or headers changed since they were harvested
+are harvested again before a job runs; a changed compilation database is
+parsed again.
+"""
+
+import json
+import os
+import socket
+import socketserver
+import stat
+
+from cut import logger
+
+LOG = logger.get_logger("system")
+
+
+def _mtimes(paths: list) -> dict:
+    stamps = {}
+    for path in paths:
+        try:
+            stamps[path] = os.stat(path).st_mtime_ns
+        except OSError:
+            stamps[path] = None
+    return stamps
+
+
+class Daemon:
+    def __init__(self, ctx, env: dict, args) -> None:
+        self._ctx = ctx
+        self._env = env
+        self._args = args
+        self._load()
+
+    def _load(self) -> None:
+        from cut import cli
+        from cut import manifest
+
+        self._manifest = manifest.Manifest(self._args.out_dir)
+        self._knowlege = cli._knowlege_base(self._args, self._ctx.actions)
+        self._stamps = {act.source: _mtimes(self._knowlege.dependencies(act.source)) for act in self._ctx.actions}
+
+    def _refresh(self, act) -> None:
+        deps = self._knowlege.dependencies(act.source)
+        if self._stamps.get(act.source) != _mtimes(deps):
+            LOG.info("harvest changed {}".format(act.source))
+            self._knowlege.harvest(act)
+            self._stamps[act.source] = _mtimes(self._knowlege.dependencies(act.source))
+
+    def generate(self, job: dict) -> dict:
+        from cut import cli
+        from cut import code_generator
+        from cut import context
+        from cut import selection as sel
+        from cut import test_case
+
+        if self._ctx.is_stale():
+            LOG.info("compilation database changed, reload")
+            self._ctx = context.RunContext(self._ctx.jfile, self._ctx.report_dir, self._ctx.selection)
+            self._load()
+        source = os.path.realpath(job["file"])
+        acts = [act for act in self._ctx.actions if os.path.realpath(act.source) == source]
+        if not acts:
+            return {"status": 1, "error": "{} is not in the compilation database".format(job["file"])}
+        act = acts[0]
+        self._refresh(act)
+
+        selection = sel.Selection(None, job.get("functions"))
+        selection.restrict({act.source: None})
+        ctx = self._ctx.with_selection(selection)
+        # every job is a run of its own
+        test_case.case_hash.clear()
+        cgen = code_generator.CodeGenerator(ctx.actions, selection, self._knowlege, self._manifest)
+        ret = cli.run_clangsa(self._env, self._args, ctx, on_done=cgen.generate_action, manifest=self._manifest)
+        self._manifest.save()
+        files = [f for f in cgen.generated if not f.endswith(".json")]
+        return {"status": ret, "files": files}
+
+    def handle(self, job: dict) -> dict:
+        command = job.get("command", "generate")
+        if command == "generate":
+            return self.generate(job)
+        if command == "status":
+            return {"status": 0, "actions": len(self._ctx.actions), "pid": os.getpid()}
+        return {"status": 1, "error": "unknown command {}".format(command)}
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    def handle(self):
+        for line in self.rfile:
+            try:
+                job = json.loads(line)
+            except ValueError:
+                reply = {"status": 1, "error": "invalid json"}
+            else:
+                if job.get("command") == "shutdown":
+                    self._reply({"status": 0})
+                    self.server.shutdown_requested = True
+                    return
+                try:
+                    reply = self.server.daemon.handle(job)
+                except Exception as ex:
+                    LOG.exception("job failed : {}".format(job))
+                    reply = {"status": 1, "error": str(ex)}
+            self._reply(reply)
+
+    def _reply(self, reply: dict) -> None:
+        self.wfile.write(json.dumps(reply).encode("utf-8") + b"\n")
+        self.wfile.flush()
+
+
+class _Server(socketserver.UnixStreamServer):
+    shutdown_requested = False
+
+
+def serve(path: str, ctx, env: dict, args) -> int:
+    """Serve jobs on the Unix socket path until a shutdown command arrives."""
+    try:
+        mode = os.lstat(path).st_mode
+    except FileNotFoundError:
+        mode = None
+    if mode is not None:
+        if not stat.S_ISSOCK(mode):
+            LOG.error("{} exists and is not a socket!".format(path))
+            return 1
+        # left behind by a daemon that did not shut down
+        os.remove(path)
+    daemon = Daemon(ctx, env, args)
+    with _Server(path, _Handler) as server:
+        server.daemon = daemon
+        LOG.info("cut daemon listening on {}".format(path))
+        try:
+            while not server.shutdown_requested:
+                server.handle_request()
+        finally:
+            os.remove(path)
+    return 0
+
+
+def request(path: str, job: dict) -> dict:
+    """Send one job to a daemon and wait for its reply."""
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.connect(path)
+        sock.sendall(json.dumps(job).encode("utf-8") + b"\n")
+        with sock.makefile("rb") as f:
+            return json.loads(f.readline())
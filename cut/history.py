@@ -0,0 +1,106 @@
+"""
+History of analyzer runs, used to schedule the most expensive translation
+units first.
+
+Each full analysis of a translation unit records its wall-clock duration and
+case count in a SQLite database keyed by the source path and the analyzer
+options. Translation units never analyzed before are estimated from their
+size and number of function definitions, scaled by the seconds per unit of
+that estimate seen in the recorded runs.
+"""
+
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+from typing import List
+
+from cut import logger
+
+LOG = logger.get_logger("system")
+
+HISTORY_FILE = "history.sqlite"
+
+# a function definition starts at column 0 and opens its body after the parameter list
+FUNCTION_DEF = re.compile(rb"^[A-Za-z_][\w \t\*]*\([^;{]*\)\s*\{", re.MULTILINE)
+# bytes of source an additional function definition is worth
+FUNCTION_WEIGHT = 2000
+# seconds per estimate unit before anything is recorded
+DEFAULT_RATE = 1e-5
+
+
+def _flags(act) -> str:
+    return hashlib.sha1("\0".join(act.analyzer_options).encode("utf-8")).hexdigest()
+
+
+def size_estimate(source: str) -> int:
+    """Estimate the analysis cost of source from its size and function definitions, in bytes."""
+    try:
+        with open(source, "rb") as f:
+            text = f.read()
+    except OSError:
+        return 0
+    return len(text) + FUNCTION_WEIGHT * len(FUNCTION_DEF.findall(text))
+
+
+class History:
+    def __init__(self, path: str) -> None:
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        with self._db:
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS runs ("
+                "source TEXT, flags TEXT, seconds REAL, cases INTEGER, estimate INTEGER, "
+                "PRIMARY KEY (source, flags))"
+            )
+
+    def _rate(self) -> float:
+        row = self._db.execute("SELECT SUM(seconds), SUM(estimate) FROM runs WHERE estimate > 0").fetchone()
+        if not row[1]:
+            return DEFAULT_RATE
+        return row[0] / row[1]
+
+    def costs(self, actions: list) -> List[float]:
+        """Expected analyzer seconds of each BuildAction."""
+        with self._lock:
+            known = {
+                (source, flags): seconds
+                for source, flags, seconds in self._db.execute("SELECT source, flags, seconds FROM runs")
+            }
+            rate = self._rate()
+        costs = []
+        for act in actions:
+            seconds = known.get((act.source, _flags(act)))
+            costs.append(seconds if seconds is not None else rate * size_estimate(act.source))
+        return costs
+
+    def record(self, act, seconds: float, cases: int) -> None:
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT OR REPLACE INTO runs VALUES (?, ?, ?, ?, ?)",
+                (act.source, _flags(act), seconds, cases, size_estimate(act.source)),
+            )
+
+    def close(self) -> None:
+        self._db.close()
+
+
+def open_history(cache_dir: str):
+    """Open the history in cache_dir, None if it is not usable."""
+    try:
+        return History(os.path.join(cache_dir, HISTORY_FILE))
+    except (OSError, sqlite3.Error) as ex:
+        LOG.warning("can not open analyzer history in {} : {}".format(cache_dir, ex))
+        return None
+
+
+def longest_first(actions: list, history) -> list:
+    """Order actions by decreasing expected cost, so the longest ones do not start last."""
+    if history is None:
+        costs = [size_estimate(act.source) for act in actions]
+    else:
+        costs = history.costs(actions)
+    order = sorted(range(len(actions)), key=lambda i: costs[i], reverse=True)
+    return [actions[i] for i in order]
@@ -1,10 +1,22 @@
 #!/usr/bin/env python
 
-import json
+import bisect
+import hashlib
+import multiprocessing
+import os
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
 from clang.cindex import CursorKind
 from clang.cindex import Index
+from clang.cindex import StorageClass
+from clang.cindex import TranslationUnit
+from clang.cindex import TypeKind
 
-from cut import log_parser
+from cut import context
+from cut import metrics
+from cut import trace
 
 
 def _get_binop_operator(cursor):
@@ -27,20 +39,48 @@ def _get_binop_operator(cursor):
     return None  # pragma: no cover
 
 
-def get_info(node) -> tuple:
+def _file_of(cursor) -> str:
+    location = cursor.location.file
+    return location.name if location else ""
+
+
+def canonical_type(ty) -> list:
+    """
+    [spelling, pointer depth] of the canonical type of a libclang type: typedefs resolved,
+    and the number of pointers around the base type.
+    """
+    canonical = ty.get_canonical()
+    base = canonical
+    pointers = 0
+    while base.kind == TypeKind.POINTER:
+        pointers += 1
+        base = base.get_pointee()
+    return [canonical.spelling, pointers]
+
+
+def get_info(node, statics: dict = None, children: list = None, canonical: dict = None) -> tuple:
+    """
+    Collect the functions, variables, typedefs and structs declared at the top level of node,
+    or in the given top level cursors.
+    With statics, functions and variables with internal linkage go to statics["funcs"] and
+    statics["vars"] instead, as name -> declaring file -> arguments or type.
+    With canonical, the canonical_type of each typedef goes to canonical[name].
+    """
     funcs = {}
     variables = {}
     typedefs = {}
     structs = {}
 
-    for child in node.get_children():
+    for child in node.get_children() if children is None else children:
         if child.kind == CursorKind.FUNCTION_DECL:
             args = {}
             for grand_child in child.get_children():
                 # print(grand_child.kind, grand_child.spelling)
                 if grand_child.kind == CursorKind.PARM_DECL:
                     args[grand_child.spelling] = grand_child.type.spelling
-            if funcs.get(child.spelling) is None:
+            if statics is not None and child.storage_class == StorageClass.STATIC:
+                statics["funcs"].setdefault(child.spelling, {})[_file_of(child)] = args
+            elif funcs.get(child.spelling) is None:
                 funcs[child.spelling] = args
             else:
                 if funcs[child.spelling] != args:
@@ -48,7 +88,9 @@ def get_info(node) -> tuple:
                     print(funcs[child.spelling])
                     print(args)
         elif child.kind == CursorKind.VAR_DECL:
-            if variables.get(child.spelling) is None:
+            if statics is not None and child.storage_class == StorageClass.STATIC:
+                statics["vars"].setdefault(child.spelling, {})[_file_of(child)] = child.type.spelling
+            elif variables.get(child.spelling) is None:
                 variables[child.spelling] = child.type.spelling
             else:
                 print("vars redefination need to do something more...", child.spelling)
@@ -56,6 +98,8 @@ def get_info(node) -> tuple:
         elif child.kind == CursorKind.TYPEDEF_DECL:
             if typedefs.get(child.spelling) is None:
                 typedefs[child.spelling] = child.underlying_typedef_type.spelling
+                if canonical is not None:
+                    canonical[child.spelling] = canonical_type(child.underlying_typedef_type)
             else:
                 print("typedefs redefination need to do something more...", child.spelling)
                 print(child.underlying_typedef_type.spelling)
@@ -71,33 +115,412 @@ def get_info(node) -> tuple:
     return (funcs, variables, typedefs, structs)
 
 
+# (header, mtime, size, flags, what preceded it) -> declarations of the header, shared by the
+# translation units of this process, least recently used first
+_header_cache = OrderedDict()
+HEADER_CACHE_SIZE = 4096
+
+
+def _config_key(options: list) -> str:
+    """
+    The flags a header's declarations may depend on. Warnings and the per object name
+    macros of kbuild are left out, so headers are shared between the objects of a directory.
+    """
+    kept = [opt for opt in options if not opt.startswith(("-W", "-DKBUILD_MODNAME", "-DKBUILD_BASENAME"))]
+    return "\0".join(kept)
+
+
+def _directives(source: str) -> list:
+    """(line, text) of the preprocessor directives of source other than #include, in order."""
+    directives = []
+    try:
+        with open(source, errors="replace") as f:
+            lines = f.read().split("\n")
+    except OSError:
+        return directives
+    i = 0
+    while i < len(lines):
+        first = i
+        text = lines[i]
+        while text.endswith("\\") and i + 1 < len(lines):
+            i += 1
+            text = text[:-1] + lines[i]
+        i += 1
+        text = text.strip()
+        if text.startswith("#") and not text[1:].lstrip().startswith(("include", "import")):
+            directives.append((first + 1, text))
+    return directives
+
+
+def _macro_keys(source: str, directory: str, tu) -> dict:
+    """
+    Header -> hash of what may define the macros seen by it: the directives of source before
+    the #include it was reached from and the headers entered before it, in order. A source or
+    an earlier header may #define a macro a header depends on (pr_fmt, DEBUG,
+    CREATE_TRACE_POINTS), the declarations of the header are only shared under the same ones.
+    """
+    directives = _directives(source)
+    digests = [hashlib.sha1()]
+    for _, text in directives:
+        sha = digests[-1].copy()
+        sha.update(text.encode("utf-8") + b"\0")
+        digests.append(sha)
+    lines = [line for line, _ in directives]
+    # header -> digest of the directives of source before it
+    before = {}
+    entered = hashlib.sha1()
+    keys = {}
+    for inc in tu.get_includes():
+        included = os.path.normpath(os.path.join(directory, inc.include.name))
+        if included in keys:
+            continue
+        including = os.path.normpath(os.path.join(directory, inc.source.name)) if inc.source else None
+        if including == source:
+            before[included] = digests[bisect.bisect_left(lines, inc.location.line)].hexdigest()
+        elif inc.source is None:
+            # -include of the command line, before any line of source
+            before[included] = digests[0].hexdigest()
+        else:
+            # all directives of source if the chain of includes is not known
+            before[included] = before.get(including, digests[-1].hexdigest())
+        sha = entered.copy()
+        sha.update(before[included].encode("utf-8"))
+        keys[included] = sha.hexdigest()
+        try:
+            st = os.stat(included)
+            entered.update("{}\0{}\0{}\0".format(included, st.st_mtime_ns, st.st_size).encode("utf-8"))
+        except OSError:
+            entered.update(included.encode("utf-8") + b"\0")
+    return keys
+
+
+def _header_key(path: str, config: str, macros: str):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (path, st.st_mtime_ns, st.st_size, config, macros)
+
+
+def _file_info(children: list, path: str) -> tuple:
+    statics = {"funcs": {}, "vars": {}}
+    canonical = {}
+    funcs, variables, typedefs, structs = get_info(None, statics, children, canonical)
+    # all cursors are from path, spelled relative to the directory of the compilation
+    for table in statics.values():
+        for name, defs in table.items():
+            table[name] = {path: value for value in defs.values()}
+    return funcs, variables, typedefs, structs, canonical, statics
+
+
+def harvest_tu(index, source: str, directory: str, options: list, skip_bodies: bool = True) -> dict:
+    """
+    Parse one translation unit and return its symbols as plain data.
+
+    Only declarations are harvested, so function bodies are skipped by default. The declarations
+    of each header are collected once per header version, flags, directives of the source before
+    its #include and headers entered before it in this process and reused by the following
+    translation units, only the source file's own are collected every time.
+    """
+    start = time.perf_counter()
+    tu = index.parse(source, options, options=TranslationUnit.PARSE_SKIP_FUNCTION_BODIES if skip_bodies else 0)
+    config = _config_key(options)
+    macros = _macro_keys(source, directory, tu)
+    # declaring file -> its top level cursors to collect, or its cached declarations, in order of appearance
+    files = OrderedDict()
+    keys = {}
+    for child in tu.cursor.get_children():
+        name = _file_of(child)
+        path = os.path.normpath(os.path.join(directory, name)) if name else ""
+        if path not in files:
+            key = _header_key(path, config, macros[path]) if path and path != source and path in macros else None
+            keys[path] = key
+            files[path] = _header_cache.get(key) if key else None
+            if files[path] is None:
+                files[path] = []
+            else:
+                _header_cache.move_to_end(key)
+        if isinstance(files[path], list):
+            files[path].append(child)
+
+    funcs, variables, typedefs, structs, canonical = {}, {}, {}, {}, {}
+    statics = {"funcs": {}, "vars": {}}
+    for path, info in files.items():
+        if isinstance(info, list):
+            info = _file_info(info, path)
+            if keys[path]:
+                _header_cache[keys[path]] = info
+                while len(_header_cache) > HEADER_CACHE_SIZE:
+                    _header_cache.popitem(last=False)
+        # the first declaration in the translation unit wins, like in get_info
+        for table, harvested in zip((funcs, variables, typedefs, structs, canonical), info):
+            for name, value in harvested.items():
+                table.setdefault(name, value)
+        for kind, harvested in info[5].items():
+            for name, defs in harvested.items():
+                statics[kind].setdefault(name, {}).update(defs)
+    deps = [source]
+    for inc in tu.get_includes():
+        deps.append(os.path.normpath(os.path.join(directory, inc.include.name)))
+    return {
+        "source": source,
+        "funcs": funcs,
+        "vars": variables,
+        "typedefs": typedefs,
+        "structs": structs,
+        "canonical": canonical,
+        "statics": statics,
+        "deps": deps,
+        "start": start,
+        "seconds": time.perf_counter() - start,
+        "pid": os.getpid(),
+    }
+
+
+_worker_index = None
+
+
+def _harvest_in_worker(job: tuple) -> dict:
+    global _worker_index
+    if _worker_index is None:
+        _worker_index = Index.create()
+    return harvest_tu(_worker_index, *job)
+
+
+def harvest_all(actions: list, jobs: int, index):
+    """
+    Yield the harvest_tu results of actions in their order, parsed in jobs worker processes
+    or, with a single job, in this process with index.
+    """
+    if jobs > 1 and len(actions) > 1:
+        # spawn, the parent may run analyzer threads which must not be forked
+        mp_context = multiprocessing.get_context("spawn")
+        jobs_args = [(act.source, act.directory, act.analyzer_options) for act in actions]
+        with ProcessPoolExecutor(max_workers=min(jobs, len(actions)), mp_context=mp_context) as pool:
+            for result in pool.map(_harvest_in_worker, jobs_args, chunksize=max(1, len(actions) // (jobs * 8))):
+                trace.record(
+                    "harvest", "tu", result["start"], result["seconds"], result["pid"], source=result["source"]
+                )
+                yield result
+    else:
+        for act in actions:
+            with trace.span("harvest", "tu", source=act.source):
+                result = harvest_tu(index, act.source, act.directory, act.analyzer_options)
+            yield result
+
+
 class KnowlegeBase:
-    def __init__(self, jfile: str) -> None:
-        self._jfile = jfile
+    """
+    Symbols of all translation units.
+
+    Functions and variables with external linkage and all typedefs and structs
+    share one namespace, later translation units win. Static functions and
+    variables are kept per declaring file, and a lookup for a translation unit
+    prefers the ones declared in it or in its headers, see scope().
+    With jobs > 1 the translation units are parsed in that many worker processes.
+    """
+
+    def __init__(self, actions: list, jobs: int = 1) -> None:
         self._init = False
         self._funcs = {}
         self._vars = {}
         self._typedefs = {}
         self._structs = {}
+        # typedef -> canonical_type
+        self._canonical = {}
+        # name -> declaring file -> arguments or type
+        self._static_funcs = {}
+        self._static_vars = {}
+        # source -> files the translation unit was parsed from
+        self._deps = {}
+        self._dep_sets = {}
 
-        jdata = json.load(open(self._jfile))
-        actions, _ = log_parser.parse_unique_log(jdata, ".", compile_uniqueing="strict")
-        index = Index.create()
-        for act in actions:
-            # print(act.source, act.analyzer_options)
-            tu = index.parse(act.source, act.analyzer_options)
-            # print(tu.cursor.spelling)
-            self._funcs, self._vars, self._typedefs, self._structs = get_info(tu.cursor)
+        self._index = Index.create()
+        for result in harvest_all(actions, jobs, self._index):
+            self._merge(result)
+
+    def harvest(self, act) -> None:
+        """Parse one translation unit and merge its symbols, later translation units win."""
+        for result in harvest_all([act], 1, self._index):
+            self._merge(result)
+
+    def _merge(self, result: dict) -> None:
+        metrics.HARVEST_SECONDS.observe(result["seconds"])
+        self._funcs.update(result["funcs"])
+        self._vars.update(result["vars"])
+        self._typedefs.update(result["typedefs"])
+        self._structs.update(result["structs"])
+        self._canonical.update(result["canonical"])
+        statics = result["statics"]
+        for table, harvested in ((self._static_funcs, statics["funcs"]), (self._static_vars, statics["vars"])):
+            for name, defs in harvested.items():
+                table.setdefault(name, {}).update(defs)
+        self._deps[result["source"]] = result["deps"]
+        self._dep_sets.pop(result["source"], None)
+
+    def dependencies(self, source: str) -> list:
+        """Source and headers of a harvested translation unit."""
+        return self._deps.get(source, [source])
+
+    def _static(self, table: dict, name: str, source: str = None):
+        defs = table.get(name)
+        if not defs:
+            return None
+        if source is None:
+            return next(iter(defs.values()))
+        if source in defs:
+            return defs[source]
+        files = self._dep_sets.get(source)
+        if files is None:
+            files = self._dep_sets[source] = frozenset(self.dependencies(source))
+        for path, value in defs.items():
+            if path in files:
+                return value
+        return None
+
+    def get_func_args(self, name: str, source: str = None):
+        """
+        Arguments of a function as seen from the translation unit source.
+        Without source the external function wins over any static one.
+        """
+        if source is None:
+            args = self._funcs.get(name)
+            return args if args is not None else self._static(self._static_funcs, name)
+        args = self._static(self._static_funcs, name, source)
+        return args if args is not None else self._funcs.get(name)
+
+    def get_var_type(self, name: str, source: str = None):
+        if source is None:
+            ty = self._vars.get(name)
+            return ty if ty is not None else self._static(self._static_vars, name)
+        ty = self._static(self._static_vars, name, source)
+        return ty if ty is not None else self._vars.get(name)
+
+    def get_typedef_type(self, name: str, source: str = None):
+        return self._typedefs.get(name)
+
+    def get_canonical_type(self, name: str, source: str = None):
+        """[spelling, pointer depth] of the fully resolved typedef name, see canonical_type."""
+        return self._canonical.get(name)
+
+    def scope(self, source: str) -> "KnowlegeScope":
+        """Lookups as seen from the translation unit source."""
+        return KnowlegeScope(self, source)
+
+
+class LazyKnowlegeBase:
+    """
+    Knowledge base parsing a translation unit only on the first lookup from it.
+
+    A lookup for source is answered from that translation unit alone, which
+    declares everything its functions use: the static symbols of its files
+    first, then its external ones. The symbols of the last cache_size
+    translation units are kept. Lookups without source only see translation
+    units harvested before.
+    """
+
+    def __init__(self, actions: list, cache_size: int = 256) -> None:
+        self._actions = {act.source: act for act in actions}
+        self._index = Index.create()
+        self._cache_size = cache_size
+        # source -> harvest_tu result, least recently used first
+        self._units = OrderedDict()
+
+    def _unit(self, source: str):
+        unit = self._units.get(source)
+        if unit is not None:
+            self._units.move_to_end(source)
+            return unit
+        act = self._actions.get(source)
+        if act is None:
+            return None
+        self.harvest(act)
+        return self._units[source]
+
+    def harvest(self, act) -> None:
+        """Parse one translation unit, replacing what was harvested from it before."""
+        for result in harvest_all([act], 1, self._index):
+            metrics.HARVEST_SECONDS.observe(result["seconds"])
+            result["dep_set"] = frozenset(result["deps"])
+            self._units[act.source] = result
+            self._units.move_to_end(act.source)
+        while len(self._units) > self._cache_size:
+            self._units.popitem(last=False)
+
+    def dependencies(self, source: str) -> list:
+        """Source and headers of a harvested translation unit."""
+        unit = self._units.get(source)
+        return unit["deps"] if unit is not None else [source]
+
+    def _lookup(self, kind: str, name: str, source: str = None):
+        if source is None:
+            units = list(reversed(self._units.values()))
+            for unit in units:
+                value = unit[kind].get(name)
+                if value is not None:
+                    return value
+            for unit in units:
+                defs = unit["statics"].get(kind, {}).get(name)
+                if defs:
+                    return next(iter(defs.values()))
+            return None
+        unit = self._unit(source)
+        if unit is None:
+            return None
+        defs = unit["statics"][kind].get(name)
+        if defs:
+            if source in defs:
+                return defs[source]
+            for path, value in defs.items():
+                if path in unit["dep_set"]:
+                    return value
+        return unit[kind].get(name)
+
+    def get_func_args(self, name: str, source: str = None):
+        return self._lookup("funcs", name, source)
+
+    def get_var_type(self, name: str, source: str = None):
+        return self._lookup("vars", name, source)
+
+    def get_typedef_type(self, name: str, source: str = None):
+        if source is None:
+            return self._lookup("typedefs", name)
+        unit = self._unit(source)
+        return unit["typedefs"].get(name) if unit is not None else None
+
+    def get_canonical_type(self, name: str, source: str = None):
+        if source is None:
+            return self._lookup("canonical", name)
+        unit = self._unit(source)
+        return unit["canonical"].get(name) if unit is not None else None
+
+    def scope(self, source: str) -> "KnowlegeScope":
+        """Lookups as seen from the translation unit source."""
+        return KnowlegeScope(self, source)
+
+
+class KnowlegeScope:
+    """
+    A knowledge base seen from one translation unit, its static symbols shadow the external ones.
+    Works on any knowledge base whose lookups take the translation unit as source.
+    """
+
+    def __init__(self, knowlege, source: str) -> None:
+        self._knowlege = knowlege
+        self._source = source
 
     def get_func_args(self, name: str):
-        return self._funcs.get(name)
+        return self._knowlege.get_func_args(name, self._source)
 
     def get_var_type(self, name: str):
-        return self._vars.get(name)
+        return self._knowlege.get_var_type(name, self._source)
 
     def get_typedef_type(self, name: str):
-        return self._typedefs.get(name)
+        return self._knowlege.get_typedef_type(name, self._source)
+
+    def get_canonical_type(self, name: str):
+        return self._knowlege.get_canonical_type(name, self._source)
 
 
 # if __name__ == "__main__":
-#     knowlege = KnowlegeBase("codechecker_commands.json")
+#     knowlege = KnowlegeBase(context.RunContext("codechecker_commands.json").actions)
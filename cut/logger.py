@@ -67,12 +67,18 @@ DEFAULT_LOG_CONFIG = """{
 }"""
 
 
-try:
-    with open(DEFAULT_LOG_CFG_FILE, "r", encoding="utf-8", errors="ignore") as dlc:
-        DEFAULT_LOG_CONFIG = dlc.read()
-except IOError as ex:
-    print(ex)
-    print("Failed to load logger configuration. Using built-in config.")
+def _load_log_config():
+    """
+    Read the log configuration file, done on setup instead of import
+    so importing the logger stays free of file access and output.
+    """
+    try:
+        with open(DEFAULT_LOG_CFG_FILE, "r", encoding="utf-8", errors="ignore") as dlc:
+            return dlc.read()
+    except IOError as ex:
+        print(ex)
+        print("Failed to load logger configuration. Using built-in config.")
+    return DEFAULT_LOG_CONFIG
 
 
 def get_logger(name):
@@ -103,7 +109,7 @@ def setup_logger(log_level=None, stream=None):
     be given (stderr -> ext://sys.stderr, 'stdout' -> ext://sys.stdout).
     """
 
-    LOG_CONFIG = json.loads(DEFAULT_LOG_CONFIG)
+    LOG_CONFIG = json.loads(_load_log_config())
     if log_level:
         log_level = validate_loglvl(log_level)
 
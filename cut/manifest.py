@@ -0,0 +1,125 @@
+"""
+Where the artifacts of a cut run are.
+
+The CaseFind checker writes <src>_<func>.json next to each source. Right after
+a translation unit is analyzed its descriptions are moved to the output
+directory (--out-dir, by default they stay in the source tree) and recorded,
+so the code generator looks them up here instead of scanning directories.
+The manifest, saved as <out_dir>/cut_manifest.json at the end of a run, maps
+each translation unit to its functions and their files, relative to the
+output directory:
+    {"units": {"/abs/src/foo.c": {"foo": {"cases": "src/foo.c_foo.json", "test": "src/foo.c_test_foo.c"}}}}
+"""
+
+import json
+import os
+import shutil
+import threading
+from typing import Dict, Optional
+
+from cut import cache
+from cut import logger
+
+LOG = logger.get_logger("system")
+
+MANIFEST_FILE = "cut_manifest.json"
+
+
+class Manifest:
+    def __init__(self, out_dir: str = None) -> None:
+        self._out_dir = out_dir
+        self._root = out_dir or "."
+        self._lock = threading.Lock()
+        # source -> function -> kind -> path relative to the output directory
+        self._units = {}
+
+    @classmethod
+    def load(cls, out_dir: str = None) -> Optional["Manifest"]:
+        """The manifest saved in out_dir, None if there is none."""
+        manifest = cls(out_dir)
+        try:
+            with open(manifest.path) as f:
+                manifest._units = json.load(f)["units"]
+        except (OSError, ValueError, KeyError):
+            return None
+        return manifest
+
+    @property
+    def path(self) -> str:
+        return os.path.join(self._root, MANIFEST_FILE)
+
+    def prefix(self, source: str) -> str:
+        """Path the artifacts of source are named after."""
+        if self._out_dir is None:
+            return source
+        rel = os.path.relpath(source)
+        if rel.startswith(os.pardir):
+            rel = os.path.join("_root", os.path.abspath(source).lstrip(os.sep))
+        return os.path.join(self._out_dir, rel)
+
+    def test_file(self, source: str, func_name: str) -> str:
+        return self.prefix(source) + "_test_" + func_name + ".c"
+
+    def _record(self, source: str, func_name: str, kind: str, path: str) -> None:
+        with self._lock:
+            self._units.setdefault(source, {}).setdefault(func_name, {})[kind] = os.path.relpath(path, self._root)
+
+    def add_cases(self, source: str, cases: Dict[str, str]) -> None:
+        """Record the case description file of each function of source."""
+        for func_name, path in cases.items():
+            self._record(source, func_name, "cases", path)
+
+    def add_test(self, source: str, func_name: str, path: str) -> None:
+        self._record(source, func_name, "test", path)
+
+    def collect(self, source: str) -> Dict[str, str]:
+        """Move the checker's case descriptions of source to the output directory and record them."""
+        cases = {}
+        prefix = len(source) + 1
+        dest = self.prefix(source)
+        if self._out_dir is not None:
+            os.makedirs(os.path.dirname(dest), exist_ok=True)
+        for f in cache.case_files(source):
+            func_name = f[prefix:-5]
+            path = dest + "_" + func_name + ".json"
+            if path != f:
+                shutil.move(f, path)
+            cases[func_name] = path
+        self.add_cases(source, cases)
+        return cases
+
+    def case_files(self, source: str) -> Dict[str, str]:
+        """Case description file of each function of source."""
+        with self._lock:
+            funcs = self._units.get(source, {})
+            return {
+                func_name: os.path.join(self._root, files["cases"])
+                for func_name, files in funcs.items()
+                if "cases" in files
+            }
+
+    def update(self, other: "Manifest") -> None:
+        """Add the units of a manifest whose paths are relative to the same directory layout."""
+        with self._lock:
+            for source, funcs in other._units.items():
+                self._units.setdefault(source, {}).update(funcs)
+
+    def files(self) -> list:
+        """All recorded files."""
+        with self._lock:
+            return [
+                os.path.join(self._root, path)
+                for funcs in self._units.values()
+                for files in funcs.values()
+                for path in files.values()
+            ]
+
+    def save(self) -> None:
+        os.makedirs(self._root, exist_ok=True)
+        with self._lock:
+            jdata = {"units": self._units}
+        tmp = self.path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(jdata, f, indent=2)
+        os.replace(tmp, self.path)
+        LOG.debug("saved {}".format(self.path))
@@ -0,0 +1,152 @@
+"""
+Run metrics, written as a Prometheus text exposition file.
+
+The stages count into the module-level metrics below, --metrics-out writes
+them at the end of the run. The file is replaced atomically, so it can be
+written into the directory of a node-exporter textfile collector:
+    cut -d compile_commands.json --metrics-out /var/lib/node_exporter/textfile/cut.prom
+"""
+
+import math
+import os
+import resource
+import threading
+import time
+from typing import List, Tuple
+
+
+def _labels(names: Tuple[str, ...], values: Tuple[str, ...]) -> str:
+    items = ['{}="{}"'.format(n, v.replace("\\", "\\\\").replace('"', '\\"')) for n, v in zip(names, values)]
+    return "{" + ",".join(items) + "}" if items else ""
+
+
+def _value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf"
+    return repr(float(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, doc: str, labels: Tuple[str, ...] = ()) -> None:
+        self.name = name
+        self.doc = doc
+        self.labels = labels
+        self._lock = threading.Lock()
+        # a metric without labels is exported as 0 until it changes
+        self._values = {} if labels else {(): 0}
+
+    def _key(self, labels: dict) -> Tuple[str, ...]:
+        return tuple(str(labels[n]) for n in self.labels)
+
+    def _samples(self) -> List[str]:
+        return ["{}{} {}".format(self.name, _labels(self.labels, key), _value(v)) for key, v in self._values.items()]
+
+    def render(self) -> List[str]:
+        with self._lock:
+            lines = ["# HELP {} {}".format(self.name, self.doc), "# TYPE {} {}".format(self.name, self.kind)]
+            return lines + self._samples()
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def set(self, value: float, **labels) -> None:
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, doc: str, buckets: Tuple[float, ...]) -> None:
+        super().__init__(name, doc)
+        self.buckets = tuple(buckets) + (math.inf,)
+        self._counts = [0] * len(self.buckets)
+        self._sum = 0.0
+
+    def observe(self, value: float) -> None:
+        with self._lock:
+            self._sum += value
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    self._counts[i] += 1
+
+    def _samples(self) -> List[str]:
+        lines = [
+            '{}_bucket{{le="{}"}} {}'.format(self.name, _value(bound), count)
+            for bound, count in zip(self.buckets, self._counts)
+        ]
+        lines.append("{}_sum {}".format(self.name, _value(self._sum)))
+        lines.append("{}_count {}".format(self.name, self._counts[-1]))
+        return lines
+
+
+ANALYZER_SECONDS = Histogram(
+    "cut_analyzer_duration_seconds",
+    "Wall-clock time of the analyzer per translation unit.",
+    (0.1, 0.5, 1, 2, 5, 10, 30, 60, 120, 300, 600, 1800),
+)
+HARVEST_SECONDS = Histogram(
+    "cut_knowledge_base_harvest_seconds",
+    "Time to harvest the symbols of one translation unit into the knowledge base.",
+    (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10, 30),
+)
+TRANSLATION_UNITS = Counter("cut_translation_units_total", "Translation units by analysis result.", ("result",))
+CASES = Counter("cut_cases_emitted_total", "Test cases written to test files.")
+DUPLICATED = Counter("cut_cases_duplicated_total", "Test cases dropped as duplicates of an earlier case.")
+FAILURES = Counter("cut_failures_total", "Failures by stage.", ("stage",))
+PEAK_RSS = Gauge("cut_peak_rss_bytes", "Peak resident set size of cut and of its largest analyzer.", ("process",))
+RUN_SECONDS = Gauge("cut_run_duration_seconds", "Wall-clock time of the run.")
+LAST_RUN = Gauge("cut_last_run_timestamp_seconds", "Time the run finished.")
+
+# export every series, an alert on a failure rate needs the zeros too
+for _result in ("succeeded", "cached", "resumed", "failed", "timed_out"):
+    TRANSLATION_UNITS.inc(0, result=_result)
+for _stage in ("trace_build", "analyze", "codegen"):
+    FAILURES.inc(0, stage=_stage)
+
+REGISTRY = [
+    ANALYZER_SECONDS,
+    HARVEST_SECONDS,
+    TRANSLATION_UNITS,
+    CASES,
+    DUPLICATED,
+    FAILURES,
+    PEAK_RSS,
+    RUN_SECONDS,
+    LAST_RUN,
+]
+
+START = time.time()
+
+
+def render() -> str:
+    now = time.time()
+    # ru_maxrss is in KiB on Linux
+    PEAK_RSS.set(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024, process="cut")
+    PEAK_RSS.set(resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * 1024, process="analyzer")
+    RUN_SECONDS.set(now - START)
+    LAST_RUN.set(now)
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+def save(path: str) -> None:
+    """Replace path atomically, a collector never reads a partial file."""
+    tmp = "{}.{}.tmp".format(path, os.getpid())
+    with open(tmp, "w") as f:
+        f.write(render())
+    os.replace(tmp, path)
@@ -0,0 +1,146 @@
+"""
+Live progress of a cut run: a status line on a terminal and periodic
+machine-readable JSON lines.
+
+Stages report into the module-level PROGRESS, which does nothing until
+start() was called.
+"""
+
+import json
+import sys
+import threading
+import time
+
+
+def _duration(seconds: float) -> str:
+    seconds = int(seconds)
+    if seconds >= 3600:
+        return "{}h{:02d}m".format(seconds // 3600, seconds % 3600 // 60)
+    if seconds >= 60:
+        return "{}m{:02d}s".format(seconds // 60, seconds % 60)
+    return "{}s".format(seconds)
+
+
+class Progress:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._tty = None
+        self._json = None
+        self._interval = 10.0
+        self.enabled = False
+        self.start_time = time.time()
+        self.tus_total = 0
+        self.tus_done = 0
+        self.tus_failed = 0
+        self.tus_cached = 0
+        self.functions = 0
+        self.cases = 0
+
+    def start(self, tty=None, json_file=None, interval: float = 10.0) -> None:
+        """Report on the tty stream and/or as JSON lines to json_file every interval seconds."""
+        self._tty = tty
+        self._json = json_file
+        self._interval = interval
+        self.start_time = time.time()
+        self.enabled = True
+        self._thread = threading.Thread(target=self._run, name="progress", daemon=True)
+        self._thread.start()
+
+    def set_total(self, tus: int) -> None:
+        with self._lock:
+            self.tus_total = tus
+
+    def tu_done(self, ok: bool = True, cached: bool = False) -> None:
+        if not self.enabled:
+            return
+        with self._lock:
+            self.tus_done += 1
+            self.tus_failed += 0 if ok else 1
+            self.tus_cached += 1 if cached else 0
+        self._draw()
+
+    def function_done(self, cases: int) -> None:
+        if not self.enabled:
+            return
+        with self._lock:
+            self.functions += 1
+            self.cases += cases
+        self._draw()
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            elapsed = time.time() - self.start_time
+            rate = self.tus_done / elapsed if elapsed > 0 else 0.0
+            remaining = self.tus_total - self.tus_done
+            return {
+                "time": time.time(),
+                "elapsed": elapsed,
+                "tus_total": self.tus_total,
+                "tus_done": self.tus_done,
+                "tus_failed": self.tus_failed,
+                "tus_cached": self.tus_cached,
+                "functions": self.functions,
+                "cases": self.cases,
+                "tus_per_second": rate,
+                "cases_per_second": self.cases / elapsed if elapsed > 0 else 0.0,
+                "eta_seconds": remaining / rate if rate > 0 else None,
+            }
+
+    def _draw(self) -> None:
+        if not self._tty:
+            return
+        snap = self.snapshot()
+        eta = "?" if snap["eta_seconds"] is None else _duration(snap["eta_seconds"])
+        line = "[cut] TUs {}/{} ({} failed, {} cached) | functions {} cases {} | {:.2f} TU/s | ETA {}".format(
+            snap["tus_done"],
+            snap["tus_total"],
+            snap["tus_failed"],
+            snap["tus_cached"],
+            snap["functions"],
+            snap["cases"],
+            snap["tus_per_second"],
+            eta,
+        )
+        with self._lock:
+            self._tty.write("\r\033[K" + line)
+            self._tty.flush()
+
+    def _emit(self) -> None:
+        if not self._json:
+            return
+        line = json.dumps(self.snapshot())
+        with self._lock:
+            self._json.write(line + "\n")
+            self._json.flush()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self._interval):
+            self._emit()
+            self._draw()
+
+    def stop(self) -> None:
+        if not self.enabled:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._emit()
+        self._draw()
+        if self._tty:
+            self._tty.write("\n")
+        if self._json and self._json is not sys.stdout:
+            self._json.close()
+        self.enabled = False
+
+
+PROGRESS = Progress()
+
+
+def start(tty: bool, json_path: str = None, interval: float = 10.0) -> None:
+    json_file = None
+    if json_path == "-":
+        json_file = sys.stdout
+    elif json_path:
+        json_file = open(json_path, "a")
+    PROGRESS.start(sys.stderr if tty else None, json_file, interval)
@@ -0,0 +1,70 @@
+"""
+Restrict a run to some source files and functions.
+"""
+
+import fnmatch
+import os
+import re
+from typing import Dict, List, Optional, Tuple
+
+from cut import shard as sh
+
+IDENTIFIER = re.compile(r"[A-Za-z_]\w*")
+
+
+class Selection:
+    """
+    files     -- glob patterns matched against the absolute source path, the path
+                 relative to the current directory and the file name.
+    functions -- function names or regular expressions matching the whole name.
+    shard     -- (K, N), only keep the K-th of N slices of the translation units.
+    """
+
+    def __init__(self, files: List[str] = None, functions: List[str] = None, shard: Tuple[int, int] = None) -> None:
+        self._files = files or []
+        self._shard = shard
+        self._functions = functions or []
+        self._names = [f for f in self._functions if IDENTIFIER.fullmatch(f)]
+        self._regexes = [re.compile(f) for f in self._functions if not IDENTIFIER.fullmatch(f)]
+        # source -> functions to analyze, None for the whole translation unit
+        self._scope = None
+
+    def __bool__(self) -> bool:
+        return bool(self._files or self._functions or self._shard or self._scope is not None)
+
+    def restrict(self, scope: Dict[str, Optional[List[str]]]) -> None:
+        """Further limit the selection to the sources and functions of scope."""
+        self._scope = scope
+
+    def match_file(self, source: str) -> bool:
+        if self._scope is not None and source not in self._scope:
+            return False
+        if self._shard and not sh.in_shard(source, self._shard):
+            return False
+        if not self._files:
+            return True
+        candidates = (source, os.path.relpath(source), os.path.basename(source))
+        return any(fnmatch.fnmatch(c, pat) for pat in self._files for c in candidates)
+
+    def match_function(self, source: str, name: str) -> bool:
+        if self._scope is not None:
+            functions = self._scope.get(source, [])
+            if functions is not None and name not in functions:
+                return False
+        if not self._functions:
+            return True
+        return name in self._names or any(r.fullmatch(name) for r in self._regexes)
+
+    def select_actions(self, actions: list) -> list:
+        return [act for act in actions if self.match_file(act.source)]
+
+    def analyze_functions(self, source: str) -> Optional[List[str]]:
+        """
+        Functions to pass to the analyzer with -analyze-function, one invocation each.
+        None means the whole translation unit has to be analyzed.
+        """
+        if self._scope is not None and self._scope.get(source) is not None:
+            return sorted(name for name in self._scope[source] if self.match_function(source, name))
+        if not self._functions or self._regexes:
+            return None
+        return sorted(self._names)
@@ -0,0 +1,100 @@
+"""
+Split one cut run across several hosts and merge their results.
+
+Each host runs with --shard K/N and analyzes only the translation units whose
+path relative to the current directory hashes to its slice. At the end of the
+run it writes cut_shard.json, listing the files it generated and its case
+dedup table. cut --merge DIR... then copies the outputs of each shard
+directory into the current tree and combines the dedup tables and the
+cut_manifest.json of the shards. With --out-dir both files are written to
+and merged from the output directories.
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import shutil
+from typing import List, Tuple
+
+from cut import logger
+
+LOG = logger.get_logger("system")
+
+SHARD_FILE = "cut_shard.json"
+
+
+def parse_shard(value: str) -> Tuple[int, int]:
+    """Parse K/N, K counting from 1."""
+    try:
+        k, n = (int(x) for x in value.split("/"))
+    except ValueError:
+        raise argparse.ArgumentTypeError("shard must be K/N, e.g. 1/4")
+    if n < 1 or not 1 <= k <= n:
+        raise argparse.ArgumentTypeError("shard K/N needs 1 <= K <= N")
+    return k, n
+
+
+def in_shard(source: str, shard: Tuple[int, int]) -> bool:
+    k, n = shard
+    digest = hashlib.sha1(os.path.relpath(source).encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "big") % n == k - 1
+
+
+def write_manifest(shard: Tuple[int, int], files: List[str], cases: dict, report_dir: str = ".") -> None:
+    jdata = {
+        "shard": "{}/{}".format(*shard),
+        "files": sorted({os.path.relpath(f, report_dir) for f in files}),
+        "cases": cases,
+    }
+    with open(os.path.join(report_dir, SHARD_FILE), "w") as f:
+        json.dump(jdata, f, indent=2)
+
+
+def merge(dirs: List[str], dest: str = ".") -> int:
+    """Copy the outputs listed in each shard's cut_shard.json into dest and combine the dedup tables."""
+    from cut import manifest as mf
+
+    cases = {}
+    files = []
+    shards = []
+    merged = mf.Manifest(dest)
+    manifests = 0
+    duplicated = 0
+    for d in dirs:
+        try:
+            with open(os.path.join(d, SHARD_FILE)) as f:
+                jdata = json.load(f)
+        except (OSError, ValueError) as ex:
+            LOG.error("can not read shard result in {} : {}".format(d, ex))
+            return 1
+        shards.append(jdata["shard"])
+        for rel in jdata["files"]:
+            src = os.path.join(d, rel)
+            dst = os.path.join(dest, rel)
+            if os.path.abspath(src) != os.path.abspath(dst):
+                os.makedirs(os.path.dirname(os.path.abspath(dst)), exist_ok=True)
+                shutil.copyfile(src, dst)
+            files.append(rel)
+        for sha, case_id in jdata["cases"].items():
+            if sha in cases:
+                duplicated += 1
+            else:
+                cases[sha] = case_id
+        # paths in the manifest are relative to its directory like the copied files
+        manifest = mf.Manifest.load(d)
+        if manifest is not None:
+            merged.update(manifest)
+            manifests += 1
+    if len(set(shards)) != len(shards):
+        LOG.warning("shard results overlap : {}".format(shards))
+    with open(os.path.join(dest, SHARD_FILE), "w") as f:
+        json.dump({"shard": "merged", "shards": shards, "files": sorted(set(files)), "cases": cases}, f, indent=2)
+    if manifests:
+        merged.save()
+    LOG.info(
+        "merged {} shards: {} files, {} cases, {} duplicated across shards".format(
+            len(dirs), len(set(files)), len(cases), duplicated
+        )
+    )
+    return 0
@@ -0,0 +1,250 @@
+"""
+Knowledge base persisted in SQLite, so translation units are only parsed
+again when they changed.
+
+A translation unit is stored under its source path and a hash of its
+flags, together with the content hashes of its source and of the headers it
+included. On open, only the translation units whose flags are new or whose
+source or headers changed are harvested; the hash of a file is reused as long
+as its size and mtime did not change. Lookups are indexed queries restricted
+to the translation units of the current run, later ones in the compilation
+database win like in KnowlegeBase.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+from typing import List
+
+from clang.cindex import Index
+
+from cut import knowlege
+from cut import logger
+from cut import metrics
+
+LOG = logger.get_logger("system")
+
+INDEX_FILE = "symbols.sqlite"
+# an index of another version is rebuilt
+SCHEMA_VERSION = 3
+TABLES = ("files", "units", "funcs", "vars", "typedefs", "structs", "canonical")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (path TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER, sha TEXT);
+CREATE TABLE IF NOT EXISTS units (
+    id INTEGER PRIMARY KEY, source TEXT, flags TEXT, digest TEXT, deps TEXT, UNIQUE (source, flags)
+);
+CREATE TABLE IF NOT EXISTS funcs (unit INTEGER, name TEXT, args TEXT, file TEXT);
+CREATE TABLE IF NOT EXISTS vars (unit INTEGER, name TEXT, type TEXT, file TEXT);
+CREATE TABLE IF NOT EXISTS typedefs (unit INTEGER, name TEXT, type TEXT);
+CREATE TABLE IF NOT EXISTS structs (unit INTEGER, name TEXT, fields TEXT);
+CREATE TABLE IF NOT EXISTS canonical (unit INTEGER, name TEXT, type TEXT, pointers INTEGER);
+CREATE INDEX IF NOT EXISTS funcs_name ON funcs (name);
+CREATE INDEX IF NOT EXISTS funcs_unit ON funcs (unit);
+CREATE INDEX IF NOT EXISTS vars_name ON vars (name);
+CREATE INDEX IF NOT EXISTS vars_unit ON vars (unit);
+CREATE INDEX IF NOT EXISTS typedefs_name ON typedefs (name);
+CREATE INDEX IF NOT EXISTS typedefs_unit ON typedefs (unit);
+CREATE INDEX IF NOT EXISTS structs_name ON structs (name);
+CREATE INDEX IF NOT EXISTS structs_unit ON structs (unit);
+CREATE INDEX IF NOT EXISTS canonical_name ON canonical (name);
+CREATE INDEX IF NOT EXISTS canonical_unit ON canonical (unit);
+"""
+
+
+def _flags(act) -> str:
+    return hashlib.sha1("\0".join(act.analyzer_options).encode("utf-8")).hexdigest()
+
+
+class SymbolIndex:
+    def __init__(self, path: str, actions: list, jobs: int = 1) -> None:
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, timeout=60, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode = WAL")
+        self._db.execute("PRAGMA synchronous = NORMAL")
+        if self._db.execute("PRAGMA user_version").fetchone()[0] != SCHEMA_VERSION:
+            with self._db:
+                for table in TABLES:
+                    self._db.execute("DROP TABLE IF EXISTS {}".format(table))
+                self._db.execute("PRAGMA user_version = {}".format(SCHEMA_VERSION))
+        self._db.executescript(SCHEMA)
+        self._index = Index.create()
+        # content hash of each file, computed at most once per run
+        self._shas = {}
+        self._deps = {}
+        self._dep_sets = {}
+        self._typedefs = {}
+        self._canonical = {}
+
+        stale = [act for act in actions if not self._is_fresh(act)]
+        LOG.info("symbol index: {} of {} translation units to harvest".format(len(stale), len(actions)))
+        for result, act in zip(knowlege.harvest_all(stale, jobs, self._index), stale):
+            self._store(act, result)
+        self._select(actions)
+
+    def _sha(self, path: str) -> str:
+        """Content hash of path, None if it is gone."""
+        if path in self._shas:
+            return self._shas[path]
+        try:
+            st = os.stat(path)
+        except OSError:
+            self._shas[path] = None
+            return None
+        row = self._db.execute("SELECT size, mtime_ns, sha FROM files WHERE path = ?", (path,)).fetchone()
+        if row and row[0] == st.st_size and row[1] == st.st_mtime_ns:
+            sha = row[2]
+        else:
+            with open(path, "rb") as f:
+                sha = hashlib.sha1(f.read()).hexdigest()
+            with self._db:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?)", (path, st.st_size, st.st_mtime_ns, sha)
+                )
+        self._shas[path] = sha
+        return sha
+
+    def _digest(self, deps: List[str]) -> str:
+        sha = hashlib.sha1()
+        for path in deps:
+            sha.update("{}\0{}\0".format(path, self._sha(path)).encode("utf-8"))
+        return sha.hexdigest()
+
+    def _is_fresh(self, act) -> bool:
+        row = self._db.execute(
+            "SELECT digest, deps FROM units WHERE source = ? AND flags = ?", (act.source, _flags(act))
+        ).fetchone()
+        return row is not None and row[0] == self._digest(json.loads(row[1]))
+
+    def _store(self, act, result: dict) -> None:
+        metrics.HARVEST_SECONDS.observe(result["seconds"])
+        deps = result["deps"]
+        with self._lock, self._db:
+            db = self._db
+            row = db.execute(
+                "SELECT id FROM units WHERE source = ? AND flags = ?", (act.source, _flags(act))
+            ).fetchone()
+            if row:
+                for table in TABLES[2:]:
+                    db.execute("DELETE FROM {} WHERE unit = ?".format(table), (row[0],))
+                db.execute("DELETE FROM units WHERE id = ?", (row[0],))
+            unit = db.execute(
+                "INSERT INTO units (source, flags, digest, deps) VALUES (?, ?, ?, ?)",
+                (act.source, _flags(act), self._digest(deps), json.dumps(deps)),
+            ).lastrowid
+            rows = [(unit, name, json.dumps(args), None) for name, args in result["funcs"].items()]
+            for name, defs in result["statics"]["funcs"].items():
+                rows.extend((unit, name, json.dumps(args), path) for path, args in defs.items())
+            db.executemany("INSERT INTO funcs VALUES (?, ?, ?, ?)", rows)
+            rows = [(unit, name, ty, None) for name, ty in result["vars"].items()]
+            for name, defs in result["statics"]["vars"].items():
+                rows.extend((unit, name, ty, path) for path, ty in defs.items())
+            db.executemany("INSERT INTO vars VALUES (?, ?, ?, ?)", rows)
+            db.executemany(
+                "INSERT INTO typedefs VALUES (?, ?, ?)", [(unit, name, ty) for name, ty in result["typedefs"].items()]
+            )
+            db.executemany(
+                "INSERT INTO structs VALUES (?, ?, ?)",
+                [(unit, name, json.dumps(fields)) for name, fields in result["structs"].items()],
+            )
+            db.executemany(
+                "INSERT INTO canonical VALUES (?, ?, ?, ?)",
+                [(unit, name, *canonical) for name, canonical in result["canonical"].items()],
+            )
+
+    def _select(self, actions: list) -> None:
+        """Restrict lookups to the translation units of actions, ranked by their position."""
+        with self._lock, self._db:
+            self._db.execute("CREATE TEMP TABLE IF NOT EXISTS current (unit INTEGER PRIMARY KEY, pos INTEGER)")
+            self._db.execute("DELETE FROM current")
+            for pos, act in enumerate(actions):
+                row = self._db.execute(
+                    "SELECT id, deps FROM units WHERE source = ? AND flags = ?", (act.source, _flags(act))
+                ).fetchone()
+                if row:
+                    self._db.execute("INSERT OR REPLACE INTO current VALUES (?, ?)", (row[0], pos))
+                    self._deps[act.source] = json.loads(row[1])
+            self._dep_sets.clear()
+            self._typedefs.clear()
+            self._canonical.clear()
+        self._actions = actions
+
+    def harvest(self, act) -> None:
+        """Parse one translation unit again and replace its symbols."""
+        self._shas.clear()
+        for result in knowlege.harvest_all([act], 1, self._index):
+            self._store(act, result)
+        self._select(self._actions)
+
+    def dependencies(self, source: str) -> list:
+        """Source and headers of a harvested translation unit."""
+        return self._deps.get(source, [source])
+
+    def _lookup(self, table: str, column: str, name: str, source: str = None):
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT t.{}, t.file FROM {} t JOIN current c ON t.unit = c.unit "
+                "WHERE t.name = ? ORDER BY c.pos DESC".format(column, table),
+                (name,),
+            ).fetchall()
+        external = next((value for value, path in rows if path is None), None)
+        statics = [(value, path) for value, path in rows if path is not None]
+        if source is None:
+            return external if external is not None or not statics else statics[0][0]
+        files = self._dep_sets.get(source)
+        if files is None:
+            files = self._dep_sets[source] = frozenset(self.dependencies(source))
+        scoped = [value for value, path in statics if path == source] or [
+            value for value, path in statics if path in files
+        ]
+        return scoped[0] if scoped else external
+
+    def get_func_args(self, name: str, source: str = None):
+        """Arguments of a function as seen from the translation unit source, see KnowlegeBase."""
+        args = self._lookup("funcs", "args", name, source)
+        return json.loads(args) if args is not None else None
+
+    def get_var_type(self, name: str, source: str = None):
+        return self._lookup("vars", "type", name, source)
+
+    def get_typedef_type(self, name: str, source: str = None):
+        if name not in self._typedefs:
+            with self._lock:
+                row = self._db.execute(
+                    "SELECT t.type FROM typedefs t JOIN current c ON t.unit = c.unit "
+                    "WHERE t.name = ? ORDER BY c.pos DESC LIMIT 1",
+                    (name,),
+                ).fetchone()
+            self._typedefs[name] = row[0] if row else None
+        return self._typedefs[name]
+
+    def get_canonical_type(self, name: str, source: str = None):
+        """[spelling, pointer depth] of the fully resolved typedef name, see knowlege.canonical_type."""
+        if name not in self._canonical:
+            with self._lock:
+                row = self._db.execute(
+                    "SELECT t.type, t.pointers FROM canonical t JOIN current c ON t.unit = c.unit "
+                    "WHERE t.name = ? ORDER BY c.pos DESC LIMIT 1",
+                    (name,),
+                ).fetchone()
+            self._canonical[name] = list(row) if row else None
+        return self._canonical[name]
+
+    def scope(self, source: str) -> "knowlege.KnowlegeScope":
+        """Lookups as seen from the translation unit source."""
+        return knowlege.KnowlegeScope(self, source)
+
+    def close(self) -> None:
+        self._db.close()
+
+
+def open_index(cache_dir: str, actions: list, jobs: int = 1):
+    """The symbol index in cache_dir updated for actions, an in-memory KnowlegeBase if it is not usable."""
+    try:
+        return SymbolIndex(os.path.join(cache_dir, INDEX_FILE), actions, jobs)
+    except (OSError, sqlite3.Error) as ex:
+        LOG.warning("can not use the symbol index in {} : {}".format(cache_dir, ex))
+        return knowlege.KnowlegeBase(actions, jobs)
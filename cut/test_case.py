@@ -68,7 +68,7 @@ def rewriteCase(case: dict, knowlege) -> None:
                 type_dict.pop(a)
 
     for (a, b) in list(model_params.items()):
-        if a.startswith("conj_$") and b in knowlege._funcs.keys():
+        if a.startswith("conj_$") and knowlege.get_func_args(b) is not None:
             if a in model_params.keys():
                 call_names[a] = model_params[a]
                 model_params.pop(a)
@@ -106,12 +106,14 @@ class TestCase:
         self._case_desc = rewriteCase(case_desc, knowlege)
         self._case_desc["size_hint"] = {}
         self._case_desc["asts"] = {}
+        # symbol -> pointer depth of its type
+        self._case_desc["pointers"] = {}
 
         self._duplicated = False
         self._knowlege = knowlege
         self._candidate_type = {}
         hash_str = name + str(self._case_desc["values"])
-        sha = hashlib.sha256(bytes(hash_str, "utf-8"))
+        sha = hashlib.sha256(bytes(hash_str, "utf-8")).hexdigest()
         case_num = len(case_hash)
         if sha in case_hash.keys():
             self._duplicated = True
@@ -120,14 +122,37 @@ class TestCase:
         self._case_id = case_num + 1
         self._compound_stmt = c_ast.Compound([])
 
-    def real_type(self, orig: str) -> str:
-        orig_type = orig.strip(" *")
-        strip = orig[len(orig_type) :]
+    @property
+    def duplicated(self) -> bool:
+        return self._duplicated
+
+    def resolve_type(self, orig: str) -> tuple:
+        """
+        (spelling, pointer depth) of a type spelled by the analyzer with its typedefs resolved,
+        the depth counts the pointers hidden in a typedef too, see knowlege.canonical_type.
+        """
+        orig = orig.strip()
+        orig_type = orig.rstrip(" *")
+        suffix = orig[len(orig_type) :]
+        canonical = self._knowlege.get_canonical_type(orig_type)
+        if canonical:
+            return canonical[0] + suffix, canonical[1] + suffix.count("*")
+        # not a typedef the knowledge base resolved, walk the chain
+        seen = set()
         real_type = self._knowlege.get_typedef_type(orig_type)
-        while real_type:
+        while real_type and real_type not in seen:
+            seen.add(orig_type)
             orig_type = real_type
             real_type = self._knowlege.get_typedef_type(orig_type)
-        return orig_type + strip
+        return orig_type + suffix, (orig_type + suffix).count("*")
+
+    def real_type(self, orig: str) -> str:
+        return self.resolve_type(orig)[0]
+
+    def pointer_depth(self, sym: str, ty: str) -> int:
+        """Pointer depth of the type of symbol sym, ty if it was not resolved."""
+        depth = self._case_desc["pointers"].get(sym)
+        return depth if depth is not None else self.resolve_type(ty)[1]
 
     def get_ref_max_index(self, sym_name, ref_level):
         max_index = 1
@@ -256,8 +281,12 @@ class TestCase:
             if argt.endswith("*"):
                 sym_name = self._case_desc["parameters"][arg]
                 if not sym_name.endswith("]"):
-                    ptr_num = argt.count("*")
-                    asts = self.generate_memory_ast(sym_name, argt, ptr_num, 0)
+                    spelling, ptr_num = self.resolve_type(argt)
+                    # generate_memory_ast walks the "*" of the spelling, keep the typedef names when
+                    # none hides a pointer
+                    if argt.count("*") == ptr_num:
+                        spelling = argt
+                    asts = self.generate_memory_ast(sym_name, spelling, ptr_num, 0)
                     memory_asts.extend(asts)
         return memory_asts
 
@@ -284,6 +313,7 @@ class TestCase:
                 if "void" in self.real_type(parent_type):
                     parent_type = type + " *"
                     self._case_desc["types"][key] = parent_type
+                    self._case_desc["pointers"][key] = self.resolve_type(parent_type)[1]
                     ty = c_ast.TypeDecl(None, [], None, type=c_ast.IdentifierType([parent_type]))
                     ast_type = c_ast.Typename(None, [], None, ty)
                     sym = c_ast.Cast(ast_type, sym)
@@ -319,6 +349,7 @@ class TestCase:
                 if "void" in self.real_type(parent_type):
                     parent_type = type + " *"
                     self._case_desc["types"][key] = parent_type
+                    self._case_desc["pointers"][key] = self.resolve_type(parent_type)[1]
                     ty = c_ast.TypeDecl(None, [], None, type=c_ast.IdentifierType([parent_type]))
                     ast_type = c_ast.Typename(None, [], None, ty)
                     sym = c_ast.Cast(ast_type, sym)
@@ -332,7 +363,7 @@ class TestCase:
                 arr_ref = c_ast.ArrayRef(name=sym, subscript=c_ast.Constant("int", value))
                 # parent_type = self._case_desc["types"][key]
                 link = "."
-                if "*" in type:
+                if self.resolve_type(type)[1]:
                     link = "->"  # fixme bug here todo
                 return c_ast.StructRef(name=arr_ref, type=link, field=c_ast.ID(name))  # ->
 
@@ -352,7 +383,7 @@ class TestCase:
                 if key in self._case_desc["types"]:
                     parent_type = self._case_desc["types"][key]
                 link = "."
-                if "*" in parent_type:
+                if self.pointer_depth(key, parent_type):
                     link = "->"  # fixme
                 return c_ast.StructRef(name=sym, type=link, field=c_ast.ID(name))
 
@@ -371,7 +402,7 @@ class TestCase:
                 sym = self.traverse_translation(param[loc + 1 :])
                 self._case_desc["parameters"][id_name] = c_generator.CGenerator().visit(sym)
                 self._case_desc["asts"][id_name] = sym
-                self._case_desc["types"][id_name] = self.real_type(type)
+                self._case_desc["types"][id_name], self._case_desc["pointers"][id_name] = self.resolve_type(type)
                 return sym
             else:  # end
                 return c_ast.ID(param)
@@ -383,11 +414,12 @@ class TestCase:
 
 if __name__ == "__main__":
     import json
+    from cut import context
     from cut import knowlege
 
     # case_desc = json.load(open("test.json"))
     case_desc = json.load(open("test.c_hehe.json"))
-    knowledge_base = knowlege.KnowlegeBase("codechecker_commands.json")
+    knowledge_base = knowlege.KnowlegeBase(context.RunContext("codechecker_commands.json").actions)
     for case in case_desc:
         test_case = TestCase("hehe", case, knowledge_base)
         test_case.generate_func()
@@ -0,0 +1,123 @@
+"""
+Timing spans of a cut run, exported as Chrome/Perfetto trace-event JSON.
+
+Usage:
+    with trace.span("analyze", "tu", source=act.source):
+        ...
+Spans are only recorded after trace.enable() was called.
+"""
+
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from cut import logger
+
+LOG = logger.get_logger("system")
+
+
+class Tracer:
+    def __init__(self) -> None:
+        self._events = []
+        self._lock = threading.Lock()
+        self._origin = time.perf_counter()
+        self.enabled = False
+
+    def _now_us(self) -> float:
+        return (time.perf_counter() - self._origin) * 1e6
+
+    @contextmanager
+    def span(self, name: str, cat: str, **args):
+        if not self.enabled:
+            yield
+            return
+        start = self._now_us()
+        try:
+            yield
+        finally:
+            event = {
+                "name": name,
+                "cat": cat,
+                "ph": "X",
+                "ts": start,
+                "dur": self._now_us() - start,
+                "pid": os.getpid(),
+                "tid": threading.get_ident(),
+                "args": args,
+            }
+            with self._lock:
+                self._events.append(event)
+
+    def record(self, name: str, cat: str, start: float, seconds: float, pid: int = None, **args) -> None:
+        """
+        Record a span timed elsewhere, e.g. in the worker process pid on this host: start is its
+        time.perf_counter(), which counts from the same system-wide clock on Linux.
+        """
+        if not self.enabled:
+            return
+        event = {
+            "name": name,
+            "cat": cat,
+            "ph": "X",
+            "ts": (start - self._origin) * 1e6,
+            "dur": seconds * 1e6,
+            "pid": os.getpid(),
+            # a worker process shows as a thread of its own
+            "tid": pid or threading.get_ident(),
+            "args": args,
+        }
+        with self._lock:
+            self._events.append(event)
+
+    def dump(self, path: str) -> None:
+        with self._lock:
+            events = list(self._events)
+        names = {t.ident: t.name for t in threading.enumerate()}
+        for tid in {e["tid"] for e in events}:
+            name = names.get(tid, str(tid))
+            events.append({"name": "thread_name", "ph": "M", "pid": os.getpid(), "tid": tid, "args": {"name": name}})
+        with open(path, "w") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+
+    def summary(self, top: int = 10) -> str:
+        """Table of total time per stage and the slowest translation units and functions."""
+        with self._lock:
+            events = list(self._events)
+        lines = []
+        stages = [e for e in events if e["cat"] == "stage"]
+        if stages:
+            lines.append("{:>12}  {}".format("seconds", "stage"))
+            for e in stages:
+                lines.append("{:>12.3f}  {}".format(e["dur"] / 1e6, e["name"]))
+        for cat, key in (("tu", "source"), ("func", "function")):
+            spans = sorted((e for e in events if e["cat"] == cat), key=lambda e: e["dur"], reverse=True)
+            if not spans:
+                continue
+            lines.append("")
+            lines.append("{:>12}  slowest {} ({} total)".format("seconds", key, len(spans)))
+            for e in spans[:top]:
+                lines.append("{:>12.3f}  {} {}".format(e["dur"] / 1e6, e["name"], e["args"].get(key, "")))
+        return "\n".join(lines)
+
+
+TRACER = Tracer()
+
+
+def enable() -> None:
+    TRACER.enabled = True
+
+
+def span(name: str, cat: str, **args):
+    return TRACER.span(name, cat, **args)
+
+
+def record(name: str, cat: str, start: float, seconds: float, pid: int = None, **args) -> None:
+    TRACER.record(name, cat, start, seconds, pid, **args)
+
+
+def save(path: str) -> None:
+    """Write the trace to path and log the summary table."""
+    TRACER.dump(path)
+    LOG.info("trace written to {}\n{}".format(path, TRACER.summary()))